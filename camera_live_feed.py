@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 
 import cv2
-from picamera2 import Picamera2
+from picamera2 import MappedArray, Picamera2
 import time
 
 def live_preview(resolution=(640, 480), framerate=15):
@@ -14,9 +14,11 @@ def live_preview(resolution=(640, 480), framerate=15):
     picam2 = Picamera2()
     # set up preview configuration at desired resolution/framerate
     config = picam2.create_preview_configuration(
-        main={"size": resolution},
-        lores={"size": resolution},  # optional lower-res stream if needed
-        display="main"
+        # "RGB888" is stored B,G,R per pixel, i.e. OpenCV's BGR order
+        main={"size": resolution, "format": "RGB888"},
+        display="main",
+        buffer_count=4,              # queue depth absorbs imshow stalls
+        controls={"FrameRate": framerate}
     )
     picam2.configure(config)
     picam2.start()
@@ -25,14 +27,17 @@ def live_preview(resolution=(640, 480), framerate=15):
 
     try:
         while True:
-            # capture a frame as RGB array
-            rgb = picam2.capture_array()
-            # convert to BGR for OpenCV
-            bgr = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
-            cv2.imshow("PiCam Live Preview (press 'q' to quit)", bgr)
+            # map the next frame in place (no memcpy) and show it as is, it is
+            # already BGR; the request must be released before the next capture
+            request = picam2.capture_request()
+            try:
+                with MappedArray(request, "main") as mapped:
+                    cv2.imshow("PiCam Live Preview (press 'q' to quit)", mapped.array)
+            finally:
+                request.release()
 
-            # waitKey(1) for realtime; break if 'q' pressed
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+            # pollKey() handles window events without waiting; break if 'q' pressed
+            if cv2.pollKey() & 0xFF == ord('q'):
                 break
 
     finally:
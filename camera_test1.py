@@ -10,13 +10,14 @@ def capture_image(resolution=(640, 480), warmup=2.0):
     as a NumPy array in BGR color order (suitable for OpenCV).
     """
     picam2 = Picamera2()
-    config = picam2.create_still_configuration(main={"size": resolution})
+    # "RGB888" is stored B,G,R per pixel, so no channel swap is needed
+    config = picam2.create_still_configuration(main={"size": resolution, "format": "RGB888"})
     picam2.configure(config)
     picam2.start()
     time.sleep(warmup)            
-    rgb = picam2.capture_array()  
+    bgr = picam2.capture_array()  
     picam2.stop()
-    return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+    return bgr
 
 if __name__ == "__main__":
     # 1) Grab the image
@@ -2,34 +2,35 @@
 
 from picamera2 import Picamera2
 import cv2
+import numpy as np
 import time
 
 def capture_image(resolution=(640, 480), warmup=2.0):
     """
     Capture a single image from the Pi Camera and return it
-    as a NumPy array in BGR color order (suitable for OpenCV).
+    as a 2-D grayscale NumPy array (the Y plane of a YUV420 frame).
     """
     picam2 = Picamera2()
-    config = picam2.create_still_configuration(main={"size": resolution})
+    config = picam2.create_still_configuration(main={"size": resolution, "format": "YUV420"})
     picam2.configure(config)
+    stream = picam2.stream_configuration("main")
+    w, h = stream["size"]
+    stride = stream["stride"]
     picam2.start()
     time.sleep(warmup)            
-    rgb = picam2.capture_array()  
+    buf = picam2.capture_buffer("main")
     picam2.stop()
-    return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+    return np.frombuffer(buf, dtype=np.uint8, count=stride * h).reshape(h, stride)[:, :w].copy()
 
 if __name__ == "__main__":
-    # 1) Grab the image
-    img = capture_image(resolution=(800, 600), warmup=1.5)
+    # 1) Grab the image (already grayscale)
+    gray = capture_image(resolution=(800, 600), warmup=1.5)
 
-    # 2) Convert to grayscale
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-    # 3) Apply Canny edge detection (tune thresholds as needed)
+    # 2) Apply Canny edge detection (tune thresholds as needed)
     edges = cv2.Canny(gray, threshold1=50, threshold2=150)
 
-    # 4) Display both
-    cv2.imshow("Original Capture", img)
+    # 3) Display both
+    cv2.imshow("Original Capture", gray)
     cv2.imshow("Edges", edges)
     cv2.waitKey(0)          # press any key to close
     cv2.destroyAllWindows()
@@ -0,0 +1,87 @@
+# Numba-compiled per-frame Otsu + ROI + decode kernels for power_meter_ocr_monitor.py
+# Importing this module requires numba; the monitor falls back to NumPy without it.
+#
+# These work on the gray LCD crop directly: the thresholded image and its integral
+# image are never written, only the pixels inside the ROIs are read, and LLVM
+# vectorizes the inner loops for the target (NEON on the Pi's Cortex-A cores).
+
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def otsu_level(gray):
+    """
+    Otsu threshold of a uint8 image, computed exactly like OpenCV's
+    THRESH_OTSU (pixels > level are white).
+    """
+    hist = np.zeros(256, dtype=np.int64)
+    for y in range(gray.shape[0]):
+        for x in range(gray.shape[1]):
+            hist[gray[y, x]] += 1
+    scale = 1.0 / (gray.shape[0] * gray.shape[1])
+    mu = 0.0
+    for i in range(256):
+        mu += i * float(hist[i])
+    mu *= scale
+    mu1 = 0.0
+    q1 = 0.0
+    max_sigma = 0.0
+    max_val = 0
+    eps = 1.1920928955078125e-07  # FLT_EPSILON, as in OpenCV
+    for i in range(256):
+        p_i = hist[i] * scale
+        mu1 *= q1
+        q1 += p_i
+        q2 = 1.0 - q1
+        if min(q1, q2) < eps or max(q1, q2) > 1.0 - eps:
+            continue
+        mu1 = (mu1 + i * p_i) / q1
+        mu2 = (mu - q1 * mu1) / q2
+        sigma = q1 * q2 * (mu1 - mu2) * (mu1 - mu2)
+        if sigma > max_sigma:
+            max_sigma = sigma
+            max_val = i
+    return max_val
+
+
+@njit(cache=True)
+def process_frame(gray, level, rois, on_threshold, first_segment, n_segments, digit_lut):
+    """
+    One compiled pass over the ROIs of a gray frame: on/off of every ROI, each
+    digit's 7-bit segment mask, and its decoded value.
+
+    gray:          uint8 image, pixels <= level count as black
+    rois:          (N, 4) x1, y1, x2, y2 in gray's coordinates; the segments of each
+                   digit are contiguous from index first_segment, n_segments each.
+                   x2/y2 are clamped to gray's shape, like slicing would, so an ROI
+                   past the edge never reads outside the (mapped camera) buffer
+    on_threshold:  black pixels needed for an ROI to count as "on"; counting in an
+                   ROI stops at the first row that reaches it
+    digit_lut:     int8 table mask -> digit, -1 for unrecognized patterns
+
+    Returns (roi_on, masks, digits); digits[d] is -1 when masks[d] did not decode.
+    """
+    n = rois.shape[0]
+    h, w = gray.shape
+    roi_on = np.empty(n, dtype=np.bool_)
+    for i in range(n):
+        x1, y1 = rois[i, 0], rois[i, 1]
+        x2, y2 = min(rois[i, 2], w), min(rois[i, 3], h)
+        black = 0
+        for y in range(y1, y2):
+            for x in range(x1, x2):
+                if gray[y, x] <= level:
+                    black += 1
+            if black >= on_threshold:
+                break
+        roi_on[i] = black >= on_threshold
+    n_digits = (n - first_segment) // n_segments
+    masks = np.zeros(n_digits, dtype=np.int64)
+    digits = np.empty(n_digits, dtype=np.int8)
+    for d in range(n_digits):
+        for j in range(n_segments):
+            if roi_on[first_segment + d * n_segments + j]:
+                masks[d] |= 1 << j
+        digits[d] = digit_lut[masks[d]]
+    return roi_on, masks, digits
@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
 
 import cv2
+import numpy as np
 import time
-from picamera2 import Picamera2
+from picamera2 import MappedArray, Picamera2
 from datetime import datetime
-import math
 import os
-import csv
+import queue
+import threading
+
+NUMBA_AVAILABLE = False
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except Exception:
+    NUMBA_AVAILABLE = False  # fall back to the integral image in count_dark_pixels()
 
 CAPTURE_INTERVAL = 0.35
 last_capture_time = 0.0
@@ -16,8 +24,32 @@ LOG_DIR = "logs"
 
 # Global handles (so both setup() and loop() can see them)
 picam2 = None
+frame_size = None     # (w, h) of the main stream, as configured by the camera
+overlay_bgr = None    # static ROI boxes for the preview, see build_roi_overlay()
+overlay_mask = None   # (h, w, 1) bool, True on overlay_bgr's box pixels
+annot_color = None    # (h, w, 3) BGR preview frame, reused every displayed frame
+dark_buf = None       # (h, w) 0/1 dark mask, reused every frame (no numba only)
+integral_buf = None   # (h + 1, w + 1) int32 summed-area table of dark_buf (no numba only)
+frame_queue = queue.Queue(maxsize=2)  # camera requests from the capture thread, oldest first
+capture_stop = threading.Event()
+capture_lock = threading.Lock()  # orders the producer's put against stop_capture()'s drain
+capture_thread = None
 window_name = "PiCam Live Preview (press 'q' to quit)"
 
+# Gray level at or below which a pixel counts as dark (lit LCD segment)
+DARK_LEVEL = 160
+# Minimum number of dark pixels for an ROI to count as "on"
+ON_THRESHOLD = 100
+
+# Show the ROIs in a second window, one ROI per frame in turn
+DEBUG_ROI = False
+debug_roi_index = 0
+
+# The preview is only for a human: show every DISPLAY_EVERY-th frame, scaled by DISPLAY_SCALE
+DISPLAY_EVERY = 3
+DISPLAY_SCALE = 0.5
+frame_idx = 0
+
 # Global offsets
 roi_offs_x = 0
 roi_offs_y = 0
@@ -52,23 +84,13 @@ SEGMENT_NAMES = ["a", "b", "c", "d", "e", "f", "g"]
 DOT_NAMES = ["0.001", "0.01", "0.1"]
 DIGIT_NAMES = ["1E4", "1E3", "1E2", "1E1", "1E0"]
 
-lcd_state = {
-    # map each digit name → its 7-segment state
-    "digits": {
-        name: { seg: False for seg in SEGMENT_NAMES }
-        for name in DIGIT_NAMES
-    },
-    # map each dot name → on/off
-    "dots": {
-        name: False
-        for name in DOT_NAMES
-    },
-    # map each mode indicator → on/off
-    "modes": {
-        mode: False
-        for mode in MODE_INDICATORS
-    }
-}
+# LCD state, one on/off flag per ROI, in the same order as the names above.
+# Filled in place every reading; digits are decoded straight from a 7-bit
+# mask built from digits_state, see DECODE_TABLE.
+dots_state = np.zeros(len(DOT_NAMES), dtype=np.bool_)
+modes_state = np.zeros(len(MODE_INDICATORS), dtype=np.bool_)
+digits_state = np.zeros((len(DIGIT_NAMES), len(SEGMENT_NAMES)), dtype=np.bool_)
+DOT_VALUES = np.array([float(name) for name in DOT_NAMES])
 
 SEGMENT_DIGIT_MAP = {
     frozenset():                                        0,
@@ -84,24 +106,59 @@ SEGMENT_DIGIT_MAP = {
     frozenset(["a","b","c","d","f","g"]):               9,
 }
 
-error_msg = ""
+# Same mapping, indexed by a 7-bit mask where bit i is set when
+# SEGMENT_NAMES[i] is lit; None for unrecognized patterns.
+DECODE_TABLE = [None] * 128
+for _segments, _digit in SEGMENT_DIGIT_MAP.items():
+    DECODE_TABLE[sum(1 << SEGMENT_NAMES.index(seg) for seg in _segments)] = _digit
+DECODE_TABLE_ARR = np.array([-1 if d is None else d for d in DECODE_TABLE], dtype=np.int8)  # -1 = unrecognized
+
+error_msgs = []        # decode warnings since the last log row, oldest first
+MAX_ERROR_MSGS = 16    # keep only the newest ones, so a broken LCD can't grow this forever
 logfile = None
-csv_writer = None
 
 def init_logger():
-    global logfile, csv_writer
+    global logfile
     os.makedirs(LOG_DIR, exist_ok=True)
     # filename is timestamped to the second
     fname = datetime.now().strftime("%Y%m%d_%H%M%S") + ".csv"
     path = os.path.join(LOG_DIR, fname)
     logfile = open(path, "w", newline="")
-    csv_writer = csv.writer(logfile)
-    # write header row
-    csv_writer.writerow(["date", "time", "mode", "value", "error"])
+    # write header row; rows end in \r\n like csv.writer's
+    logfile.write("date,time,mode,value,error\r\n")
     logfile.flush()
-    return logfile, csv_writer
+    return logfile
+
+_ts_cache_epoch = 0   # second that the cached strings below were formatted for
+_ts_cache_date = ""   # "YYYY-MM-DD"
+_ts_cache_hms = ""    # "HH:MM:SS"
+
+def _update_ts_cache(now):
+    # Reformat the date and time-of-day strings only when the second changes;
+    # returns the whole second of now
+    global _ts_cache_epoch, _ts_cache_date, _ts_cache_hms
+    sec = int(now)
+    if sec != _ts_cache_epoch:
+        _ts_cache_date, _ts_cache_hms = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(sec)).split(" ")
+        _ts_cache_epoch = sec
+    return sec
+
+def format_timestamp(now):
+    """
+    Format a time.time() value as "YYYY-MM-DD HH:MM:SS.ffffff". The part
+    up to the seconds only changes once a second, so it is cached.
+    """
+    sec = _update_ts_cache(now)
+    return f"{_ts_cache_date} {_ts_cache_hms}.{int((now - sec) * 1e6):06d}"
+
+def csv_field(text: str) -> str:
+    # Quote a free-text CSV field the way csv.writer does (QUOTE_MINIMAL); the
+    # other fields are numbers and fixed names that never need it
+    if any(c in text for c in ',"\r\n'):
+        return '"' + text.replace('"', '""') + '"'
+    return text
 
-def log_entry(writer, mode, value, error_msg, logfile):
+def log_entry(mode, value, error_msg, logfile):
     """
     Append one row to the CSV:
       date (YYYY-MM-DD),
@@ -110,58 +167,38 @@ def log_entry(writer, mode, value, error_msg, logfile):
       value (float),
       error (string, blank if none)
     """
-    now = datetime.now()
-    date_str = now.strftime("%Y-%m-%d")
+    now = time.time()
+    sec = _update_ts_cache(now)
+    date_str = _ts_cache_date
     # nearest tenth of a second (truncate)
-    tenth = now.microsecond // 100000
-    time_str = f"{now:%H:%M:%S}.{tenth}"
-    csv_writer.writerow([
-        date_str,
-        time_str,
-        mode,
-        f"{value:.4f}",
-        error_msg or ""
-    ])
+    tenth = int((now - sec) * 10)
+    time_str = f"{_ts_cache_hms}.{tenth}"
+    logfile.write(f"{date_str},{time_str},{mode},{value:.4f},{csv_field(error_msg or '')}\r\n")
     logfile.flush()
 
-def decode_digit(segments: dict[str, bool]) -> int | None:
+def decode_digit(mask: int) -> int | None:
     """
-    Given a dict mapping segment names ("a"–"g") to booleans,
+    Given a 7-bit segment mask (bit i set when SEGMENT_NAMES[i] is lit),
     return the integer 0–9 that those segments form, or None
     if the pattern is unrecognized.
     """
-    global error_msg
-    on_segments = { seg for seg, lit in segments.items() if lit }
-    digit = SEGMENT_DIGIT_MAP.get(frozenset(on_segments))
+    digit = DECODE_TABLE[mask]
     if digit is None:
-        # sorted(...) just makes the output deterministic/orderly
-        error = f"Warning: decode_digit got unrecognized segment pattern: {sorted(on_segments)}"
-        error_msg = error_msg + error
+        # SEGMENT_NAMES is alphabetical, so this list comes out sorted
+        on_segments = [seg for i, seg in enumerate(SEGMENT_NAMES) if mask >> i & 1]
+        error = f"Warning: decode_digit got unrecognized segment pattern: {on_segments}"
+        error_msgs.append(error)
+        if len(error_msgs) > MAX_ERROR_MSGS:
+            del error_msgs[0]
         print(error)
     return digit
 
-def evaluate_roi(frame_thresh, roi_tuple, on_threshold=50):
-    x1, y1, x2, y2 = roi_tuple
-    roi_image = frame_thresh[y1:y2, x1:x2]
-    
-    # count white pixels (value==255)
-    white_pixels = cv2.countNonZero(roi_image)
-    total_pixels = roi_image.shape[0] * roi_image.shape[1]
-    black_pixels = (float(total_pixels) - white_pixels)
-
-    return_value = black_pixels >= on_threshold
-    
-    # Show secondwindow with ROI under consideration
-    #cv2.imshow("Extracted Segment", roi_image)
-    #cv2.waitKey(1)
-    
-    return black_pixels >= on_threshold
-
- 
 def get_digit_sub_roi(digit_roi):
+    # All inputs are integer pixel coords and all offsets/sizes are integers,
+    # so integer division gives exactly the same boxes as floor() of the float math.
     dx1, dy1, dx2, dy2 = digit_roi
-    x_middle = dx1 + (dx2 - dx1)/2.0
-    y_middle = dy1 + (dy2 - dy1)/2.0
+    x_middle = dx1 + (dx2 - dx1) // 2
+    y_middle = dy1 + (dy2 - dy1) // 2
     short_size = 20
     long_size = 40
     offset_lateral = 36
@@ -169,246 +206,353 @@ def get_digit_sub_roi(digit_roi):
     y_seg_offset_side_top = -42
     y_seg_offset_side_bott = 46
     y_seg_offset_bott = 87
+    half_short = short_size // 2
+    half_long = long_size // 2
     
-    roi_top = ( math.floor(x_middle - short_size/2),
-                math.floor(y_middle + y_seg_offset_top - long_size/2),
-                math.floor(x_middle + short_size/2),
-                math.floor(y_middle + y_seg_offset_top + long_size/2))
+    roi_top = ( x_middle - half_short,
+                y_middle + y_seg_offset_top - half_long,
+                x_middle + half_short,
+                y_middle + y_seg_offset_top + half_long)
     
-    roi_bott = ( math.floor(x_middle - short_size/2),
-                math.floor(y_middle + y_seg_offset_bott - long_size/2),
-                math.floor(x_middle + short_size/2),
-                math.floor(y_middle + y_seg_offset_bott + long_size/2))
+    roi_bott = ( x_middle - half_short,
+                y_middle + y_seg_offset_bott - half_long,
+                x_middle + half_short,
+                y_middle + y_seg_offset_bott + half_long)
     
-    roi_midd = ( math.floor(x_middle - short_size/2),
-                math.floor(y_middle  - long_size/2),
-                math.floor(x_middle + short_size/2),
-                math.floor(y_middle + long_size/2))
+    roi_midd = ( x_middle - half_short,
+                y_middle - half_long,
+                x_middle + half_short,
+                y_middle + half_long)
     
-    roi_tl =  ( math.floor(x_middle - offset_lateral - long_size/2),
-                math.floor(y_middle + y_seg_offset_side_top - short_size/2),
-                math.floor(x_middle - offset_lateral + long_size/2),
-                math.floor(y_middle + y_seg_offset_side_top + short_size/2))
+    roi_tl =  ( x_middle - offset_lateral - half_long,
+                y_middle + y_seg_offset_side_top - half_short,
+                x_middle - offset_lateral + half_long,
+                y_middle + y_seg_offset_side_top + half_short)
     
-    roi_tr =  ( math.floor(x_middle + offset_lateral - long_size/2),
-                math.floor(y_middle + y_seg_offset_side_top - short_size/2),
-                math.floor(x_middle + offset_lateral + long_size/2),
-                math.floor(y_middle + y_seg_offset_side_top + short_size/2))
+    roi_tr =  ( x_middle + offset_lateral - half_long,
+                y_middle + y_seg_offset_side_top - half_short,
+                x_middle + offset_lateral + half_long,
+                y_middle + y_seg_offset_side_top + half_short)
     
-    roi_bl =  ( math.floor(x_middle - offset_lateral - long_size/2),
-                math.floor(y_middle + y_seg_offset_side_bott - short_size/2),
-                math.floor(x_middle - offset_lateral + long_size/2),
-                math.floor(y_middle + y_seg_offset_side_bott + short_size/2))
+    roi_bl =  ( x_middle - offset_lateral - half_long,
+                y_middle + y_seg_offset_side_bott - half_short,
+                x_middle - offset_lateral + half_long,
+                y_middle + y_seg_offset_side_bott + half_short)
     
-    roi_br =  ( math.floor(x_middle + offset_lateral - long_size/2),
-                math.floor(y_middle + y_seg_offset_side_bott - short_size/2),
-                math.floor(x_middle + offset_lateral + long_size/2),
-                math.floor(y_middle + y_seg_offset_side_bott + short_size/2))
+    roi_br =  ( x_middle + offset_lateral - half_long,
+                y_middle + y_seg_offset_side_bott - half_short,
+                x_middle + offset_lateral + half_long,
+                y_middle + y_seg_offset_side_bott + half_short)
         
     return (roi_top, roi_tr, roi_br, roi_bott, roi_bl, roi_tl, roi_midd)
 
+# The digit ROIs never move, so compute their segment ROIs once, in DIGIT_NAMES order
+DIGIT_SEGMENT_ROIS = tuple(get_digit_sub_roi(r) for r in array_of_digit_rois)
+SEG_ROI_ARRAY = np.array(DIGIT_SEGMENT_ROIS, dtype=np.int32)  # the same boxes, shape (5, 7, 4)
+
+# Every ROI that gets evaluated, as one (N, 4) table of (x1, y1, x2, y2):
+# dots, then modes, then the 7 segments of each digit in DIGIT_NAMES order.
+ALL_ROIS = np.concatenate((array_of_dot_rois, array_of_mode_rois,
+                           SEG_ROI_ARRAY.reshape(-1, 4))).astype(np.intp)
+ROI_X1, ROI_Y1, ROI_X2, ROI_Y2 = ALL_ROIS.T
+N_DOTS = len(array_of_dot_rois)
+N_MODES = len(array_of_mode_rois)
+
+def roi_outlines(rois):
+    """
+    Return the given ROIs as an (N, 4, 2) int32 array of closed quadrilaterals
+    (display offsets applied), the form cv2.polylines/fillPoly draw in one call.
+    """
+    return np.array([
+        [(x1 + roi_offs_x, y1 + roi_offs_y), (x2 + roi_offs_x, y1 + roi_offs_y),
+         (x2 + roi_offs_x, y2 + roi_offs_y), (x1 + roi_offs_x, y2 + roi_offs_y)]
+        for x1, y1, x2, y2 in rois
+    ], dtype=np.int32)
+
+# Preview boxes grouped by color (BGR): one polylines() call per group
+ROI_OUTLINE_GROUPS = [
+    (roi_outlines(array_of_dot_rois), (255, 0, 0)),
+    (roi_outlines(array_of_mode_rois), (0, 255, 0)),
+    (roi_outlines(array_of_digit_rois), (0, 0, 255)),
+    (roi_outlines(SEG_ROI_ARRAY.reshape(-1, 4).tolist()), (255, 0, 255)),
+]
+# Small "lit" marker in the bottom-right corner of each ROI, in ALL_ROIS order
+LIT_MARKERS = roi_outlines([(x2 - 5, y2 - 5, x2, y2) for x1, y1, x2, y2 in ALL_ROIS.tolist()])
+
+def build_roi_overlay():
+    # The ROI boxes never move: render them once, with a mask of where they are
+    global overlay_bgr, overlay_mask
+    w, h = frame_size
+    overlay_bgr = np.zeros((h, w, 3), np.uint8)
+    for outlines, color in ROI_OUTLINE_GROUPS:
+        cv2.polylines(overlay_bgr, outlines, True, color, 1)
+    overlay_mask = overlay_bgr.any(axis=2, keepdims=True)
+
+def draw_roi_overlay(frame_bgr, roi_on):
+    # pre-rendered ROI boxes in one masked copy, then a filled red marker on every ROI that is on
+    np.copyto(frame_bgr, overlay_bgr, where=overlay_mask)
+    if roi_on.any():
+        cv2.fillPoly(frame_bgr, LIT_MARKERS[roi_on], (0, 0, 255))
+
+def count_dark_pixels(frame_gray):
+    """
+    Return the number of dark pixels (<= DARK_LEVEL) inside every ROI of
+    ALL_ROIS, as one vector. With numba this is a single pass over the ROI
+    pixels only, which stops early in an ROI once ON_THRESHOLD is reached (so
+    counts may be capped there); otherwise one integral image of the dark mask
+    is built per frame, into buffers allocated once in setup(), after which
+    each ROI costs four lookups.
+    """
+    if NUMBA_AVAILABLE:
+        counts = np.empty(len(ALL_ROIS), dtype=np.int32)
+        count_dark_pixels_kernel(frame_gray, ALL_ROIS, DARK_LEVEL, ON_THRESHOLD, counts)
+        return counts
+    np.less_equal(frame_gray, DARK_LEVEL, out=dark_buf.view(np.bool_))
+    ii = cv2.integral(dark_buf, integral_buf, sdepth=cv2.CV_32S)
+    return ii[ROI_Y2, ROI_X2] - ii[ROI_Y1, ROI_X2] - ii[ROI_Y2, ROI_X1] + ii[ROI_Y1, ROI_X1]
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True, boundscheck=False)
+    def count_dark_pixels_kernel(gray, rois, level, limit, out_counts):
+        # One ROI per parallel iteration; the ROIs never overlap out_counts slots.
+        # Only "count >= limit" matters to the caller, so an ROI is done as soon as
+        # a row takes it there (checked per row, so the inner loop stays simple).
+        for i in prange(rois.shape[0]):
+            x1, y1, x2, y2 = rois[i, 0], rois[i, 1], rois[i, 2], rois[i, 3]
+            n = 0
+            for y in range(y1, y2):
+                for x in range(x1, x2):
+                    if gray[y, x] <= level:
+                        n += 1
+                if n >= limit:
+                    break
+            out_counts[i] = n
+
+def luma_view(yuv):
+    """
+    Return the Y (luma) plane of a mapped YUV420 frame, which picamera2
+    presents as an (h * 3/2, stride) array, as an (h, w) view without
+    copying. This is the grayscale image.
+    """
+    w, h = frame_size
+    return yuv[:h, :w]
+
 def setup(resolution=(640, 480), framerate=30):
     """
     Configure and start the camera, create the display window.
     """
     global last_capture_time
     
-    last_capture_time = time.time() - CAPTURE_INTERVAL
+    last_capture_time = time.monotonic() - CAPTURE_INTERVAL
+
+    # Make sure OpenCV uses its SIMD kernels, and give the parallel ones
+    # (threshold, resize, cvtColor, ...) half the cores
+    cv2.setUseOptimized(True)
+    cv2.setNumThreads(max(2, (os.cpu_count() or 1) // 2))
+    print(f"OpenCV optimized: {cv2.useOptimized()}, threads: {cv2.getNumThreads()}")
     
-    global picam2
+    global picam2, frame_size, capture_thread, annot_color, dark_buf, integral_buf
     picam2 = Picamera2()
+    # YUV420: the first plane is already grayscale, so no color conversion is needed.
+    # No lores stream: nothing reads it, and at full size it only doubles the ISP output.
+    # The capture thread may hold up to 3 requests (2 queued + 1 in loop()), so
+    # allocate enough buffers that the camera always has some to fill.
     config = picam2.create_preview_configuration(
-        main={"size": resolution},
-        lores={"size": resolution},
-        display="main"
+        main={"size": resolution, "format": "YUV420"},
+        # no display stream: frames are only shown through the OpenCV window
+        buffer_count=6,
+        controls={"FrameRate": framerate}
     )
     picam2.configure(config)
+    frame_size = picam2.stream_configuration("main")["size"]
     picam2.start()
     # give the sensor a moment to adjust
     time.sleep(0.1)
+    capture_thread = threading.Thread(target=capture_frames, name="capture", daemon=True)
+    capture_thread.start()
 
     # create the OpenCV window once
     cv2.namedWindow(window_name, cv2.WINDOW_AUTOSIZE)
+    build_roi_overlay()
+    w, h = frame_size
+    annot_color = np.empty((h, w, 3), dtype=np.uint8)
+    if not NUMBA_AVAILABLE:
+        dark_buf = np.empty((h, w), dtype=np.uint8)
+        integral_buf = np.empty((h + 1, w + 1), dtype=np.int32)
     
 
+def capture_frames():
+    """
+    Producer thread: keep the newest camera requests queued for loop(), so a
+    slow iteration (preview, logging) never stalls the camera. When loop()
+    falls behind, the oldest queued request is dropped and released.
+    """
+    while True:
+        request = picam2.capture_request()
+        with capture_lock:
+            if capture_stop.is_set():
+                # stop_capture() has drained (or is about to drain) the queue
+                request.release()
+                return
+            if frame_queue.full():
+                try:
+                    frame_queue.get_nowait().release()
+                except queue.Empty:
+                    pass
+            frame_queue.put_nowait(request)
+
+def next_frame(timeout=2.0):
+    """
+    Return the newest queued camera request, releasing any older ones.
+    The caller must release() the returned request.
+    """
+    request = frame_queue.get(timeout=timeout)
+    while True:
+        try:
+            newer = frame_queue.get_nowait()
+        except queue.Empty:
+            return request
+        request.release()
+        request = newer
+
+def stop_capture():
+    # Under the lock, so no request gets queued after the drain below; one still
+    # being captured is released by capture_frames() itself
+    with capture_lock:
+        capture_stop.set()
+    if capture_thread is not None:
+        capture_thread.join(timeout=1.0)
+    # hand any frames nobody consumed back to the camera
+    while True:
+        try:
+            frame_queue.get_nowait().release()
+        except queue.Empty:
+            break
+
 frame_clean_gr_prev = None
 #frame_clean_gr = None
 
+# LCD change detection. The display only updates every ~0.73-0.8 s, far slower
+# than we capture, so the ROIs are only re-read when a 4x downsampled copy of the
+# frame differs from the one at the last reading.
+CHANGE_LEVEL = 20        # per-pixel gray difference that counts as changed
+# Changed pixels (at 1/4 scale) needed to re-read the LCD. The smallest change is
+# a decimal point alone: ON_THRESHOLD (100) dark pixels in a 24x24 ROI, which
+# moves only ~4-10 quarter-scale pixels past CHANGE_LEVEL depending on how it
+# straddles the 4x4 blocks, so the bar has to sit below that.
+CHANGE_MIN_PIXELS = 3
+frame_small_ref = None   # downsampled frame at the last reading
+last_reading = None      # (roi_on, mode_str, total_value) of the last reading
+
+def lcd_has_changed(frame_gray):
+    global frame_small_ref
+    small = cv2.resize(frame_gray, None, fx=0.25, fy=0.25, interpolation=cv2.INTER_AREA)
+    if frame_small_ref is not None:
+        diff = cv2.absdiff(frame_small_ref, small)
+        if cv2.countNonZero(cv2.compare(diff, CHANGE_LEVEL, cv2.CMP_GT)) < CHANGE_MIN_PIXELS:
+            return False
+    # compare against the frame we actually read, so slow drift still adds up
+    frame_small_ref = small
+    return True
+
 
 def loop():
     
-    global csv_writer, logfile, error_msg, last_capture_time
+    global logfile, last_capture_time, last_reading, debug_roi_index, frame_idx
 
-    now = time.time()
-    # Capture
-    
-    if now - last_capture_time >= CAPTURE_INTERVAL:
-        rgb = picam2.capture_array()
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
-        
-        #update_rate_time_now = time.time() # For testing mode update rate measurement
-        
-        # Convert for OpenCV
-        
-        frame_clean = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
-        frame_clean_gr_pre_thresh = cv2.cvtColor(frame_clean, cv2.COLOR_BGR2GRAY)
-        
-        _, frame_clean_gr = cv2.threshold( frame_clean_gr_pre_thresh,    # source image
-                                            160,               # threshold value (tweak as needed)
-                                            255,               # max value for pixels above threshold
-                                            cv2.THRESH_BINARY  # type of thresholding
-        )
-        
-        #############################################################
-        # Optional block to measure LCD update rate. Very likely 0.8 seconds, or 0.734.
-    #     if False:
-    #         global frame_clean_gr_prev
-    #         global update_rate_time_last
-    #         if frame_clean_gr_prev is None:
-    #             frame_clean_gr_prev = frame_clean_gr.copy()
-    #             update_rate_time_last = update_rate_time_now
-    #         
-    #         diff = cv2.absdiff(frame_clean_gr_prev, frame_clean_gr)
-    #         _, mask = cv2.threshold(diff, 55, 255, cv2.THRESH_BINARY)
-    #         num_pixels_changed = cv2.countNonZero(mask)
-    #         if num_pixels_changed > 1000:
-    #             update_rate_delta_t = update_rate_time_now - update_rate_time_last
-    #             print(f"Display updated after {delta_t:.3f}s, {num_pixels_changed: 3f}")
-    #             update_rate_time_last = update_rate_time_now
-    #         
-    #         frame_clean_gr_prev = frame_clean_gr
-    #         
-    #         #frame_clean_th_previous = frame_clean_th.copy()
-    #         #frame_annotated = frame_clean_gr.copy()
-    #         #frame_annotated = diff.copy()
-    #         frame_annotated = mask.copy()
-        ###############################################################
-            
-        frame_annotated = frame_clean_gr.copy()
-        frame_annotated_color = cv2.cvtColor(frame_annotated,cv2.COLOR_GRAY2BGR)
-        
-        ##### Annotate frame with date
-        
-        
-        # args: image, text, org (x,y), font, fontScale, color (BGR), thickness, lineType
-        cv2.putText(
-            frame_annotated_color,
-            timestamp,
-            (10, 30),                             # position in pixels from top-left
-            cv2.FONT_HERSHEY_SIMPLEX,             # font face
-            0.6,                                  # font scale (size)
-            (0, 200, 0),                   # font color (white)
-            1,                                    # thickness
-            cv2.LINE_AA                           # anti-aliased line
-        )
+    # Sleep off the rest of the capture interval; monotonic, so clock steps
+    # (NTP) don't stretch or skip it
+    remaining = CAPTURE_INTERVAL - (time.monotonic() - last_capture_time)
+    if remaining > 0:
+        time.sleep(remaining)
 
-        ### Draw colored ROI boxes for all ROIs
-        
-        ########### DOTS
-        for dot_name, dot_roi in zip(DOT_NAMES, array_of_dot_rois):
-            x1, y1, x2, y2 = dot_roi
-            cv2.rectangle(
-                frame_annotated_color,
-                (x1 + roi_offs_x, y1 + roi_offs_y),
-                (x2 + roi_offs_x, y2 + roi_offs_y),
-                (255, 0, 0),
-                1
-                )
-            roi_status = evaluate_roi(frame_clean_gr, dot_roi, on_threshold=100)
-            lcd_state["dots"][dot_name] = roi_status
-            
-            #print(f"ROI {segment_roi} status: {roi_status}")
-            if roi_status is True:
-                cv2.rectangle(
-                    frame_annotated_color,
-                    (x2 + roi_offs_x - 5, y2 + roi_offs_y - 5),
-                    (x2 + roi_offs_x, y2 + roi_offs_y),
-                    (0, 0, 255),
-                    -1
-                    )
-                
-        ########### MODES    
-        for mode_name, mode_roi in zip(MODE_INDICATORS, array_of_mode_rois):
-            x1, y1, x2, y2 = mode_roi
-            cv2.rectangle(
-                frame_annotated_color,
-                (x1 + roi_offs_x, y1 + roi_offs_y),
-                (x2 + roi_offs_x, y2 + roi_offs_y),
-                (0, 255, 0),
-                1
-                )
-            roi_status = evaluate_roi(frame_clean_gr, mode_roi, on_threshold=100)
-            lcd_state["modes"][mode_name] = roi_status
-            
-            #print(f"ROI {segment_roi} status: {roi_status}")
-            if roi_status is True:
-                cv2.rectangle(
-                    frame_annotated_color,
-                    (x2 + roi_offs_x - 5, y2 + roi_offs_y - 5),
-                    (x2 + roi_offs_x, y2 + roi_offs_y),
-                    (0, 0, 255),
-                    -1
-                    )
-                
-        ########### DIGITS
-        for digit_name, digit_roi in zip(DIGIT_NAMES, array_of_digit_rois):
-            x1, y1, x2, y2 = digit_roi
-            cv2.rectangle(
-                frame_annotated_color,
-                (x1 + roi_offs_x, y1 + roi_offs_y),
-                (x2 + roi_offs_x, y2 + roi_offs_y),
-                (0, 0, 255),
-                1
-                )
-            
-            segment_rois = get_digit_sub_roi(digit_roi)
-            
-            for seg_name, segment_roi in zip(SEGMENT_NAMES, segment_rois):
-                #print(segment_roi)
-                sx1, sy1, sx2, sy2 = segment_roi
-                cv2.rectangle(
-                    frame_annotated_color,
-                    (sx1 + roi_offs_x, sy1 + roi_offs_y),
-                    (sx2 + roi_offs_x, sy2 + roi_offs_y),
-                    (255, 0, 255),
-                    1
-                    )
-                
-                roi_status = evaluate_roi(frame_clean_gr, segment_roi, on_threshold=100)
-                lcd_state["digits"][digit_name][seg_name] = roi_status
-                
-                #print(f"ROI {segment_roi} status: {roi_status}")
-                if roi_status is True:
-                    cv2.rectangle(
-                        frame_annotated_color,
-                        (sx2 + roi_offs_x - 5, sy2 + roi_offs_y - 5),
-                        (sx2 + roi_offs_x, sy2 + roi_offs_y),
-                        (0, 0, 255),
-                        -1
-                        )   
-
-        #At this point the dictionary should be updated for the entire LCD state. 
+    try:
+        request = next_frame()
+    except queue.Empty:
+        # Camera hiccup: nothing arrived within next_frame()'s timeout; try again
+        # next interval rather than taking the whole logger down
+        print("[camera] no frame within 2 s, retrying")
+        return True
+    last_capture_time = time.monotonic()
+    timestamp = format_timestamp(time.time())
+    show_frame = frame_idx % DISPLAY_EVERY == 0
+    frame_idx += 1
+    
+    #update_rate_time_now = time.time() # For testing mode update rate measurement
+    
+    try:
+        with MappedArray(request, "main") as mapped:
+            # Grayscale straight from the Y plane, read in place from the
+            # camera buffer: no memcpy and no cvtColor needed.
+            frame_clean_gr = luma_view(mapped.array)
+
+            # Evaluate all ROIs at once, but only if the LCD changed
+            lcd_changed = lcd_has_changed(frame_clean_gr)
+            if lcd_changed:
+                roi_on = count_dark_pixels(frame_clean_gr) >= ON_THRESHOLD
+
+            if DEBUG_ROI:
+                # Show second window with the ROI under consideration. No waitKey
+                # here: the window gets drawn by the single pollKey below.
+                x1, y1, x2, y2 = ALL_ROIS[debug_roi_index]
+                cv2.imshow("Extracted Segment", frame_clean_gr[y1:y2, x1:x2])
+                debug_roi_index = (debug_roi_index + 1) % len(ALL_ROIS)
+
+            # The buffer goes back to the camera below, so convert it for
+            # display now, straight into the preallocated preview frame
+            if show_frame:
+                cv2.cvtColor(frame_clean_gr, cv2.COLOR_GRAY2BGR, dst=annot_color)
+    finally:
+        request.release()
+
+    #############################################################
+    # Optional block to measure LCD update rate. Very likely 0.8 seconds, or 0.734.
+#     if False:
+#         global frame_clean_gr_prev
+#         global update_rate_time_last
+#         if frame_clean_gr_prev is None:
+#             frame_clean_gr_prev = frame_clean_gr.copy()
+#             update_rate_time_last = update_rate_time_now
+#         
+#         diff = cv2.absdiff(frame_clean_gr_prev, frame_clean_gr)
+#         _, mask = cv2.threshold(diff, 55, 255, cv2.THRESH_BINARY)
+#         num_pixels_changed = cv2.countNonZero(mask)
+#         if num_pixels_changed > 1000:
+#             update_rate_delta_t = update_rate_time_now - update_rate_time_last
+#             print(f"Display updated after {delta_t:.3f}s, {num_pixels_changed: 3f}")
+#             update_rate_time_last = update_rate_time_now
+#         
+#         frame_clean_gr_prev = frame_clean_gr
+#         
+#         #frame_clean_th_previous = frame_clean_th.copy()
+#         #frame_annotated = frame_clean_gr.copy()
+#         #frame_annotated = diff.copy()
+#         frame_annotated = mask.copy()
+    ###############################################################
+
+    if lcd_changed:
+        # Split the on/off vector back up by ROI group
+        dots_state[:] = roi_on[:N_DOTS]
+        modes_state[:] = roi_on[N_DOTS:N_DOTS + N_MODES]
+        digits_state.flat[:] = roi_on[N_DOTS + N_MODES:]
+        # Pack every digit's segments into a 7-bit mask, then one table lookup
+        digit_masks = np.packbits(digits_state, axis=1, bitorder="little")[:, 0]
+        digits = DECODE_TABLE_ARR[digit_masks]
+
+        #At this point the state arrays and digit masks hold the entire LCD state. 
      
-        digit_values = [
-            decode_digit(lcd_state["digits"][name])
-            for name in DIGIT_NAMES
-        ]
-        
-        digit_1E4, digit_1E3, digit_1E2, digit_1E1, digit_1E0 = digit_values
-        
-        if any(v is None for v in digit_values):
+        if (digits < 0).any():
+            # decode_digit() reports each unrecognized pattern
+            digit_values = [decode_digit(mask) for mask in digit_masks.tolist()]
             print("Warning: one or more segments failed to decode:", digit_values)
             total_value = 0.0
         else:
+            digit_1E4, digit_1E3, digit_1E2, digit_1E1, digit_1E0 = digits.tolist()
             # 4) Compute the total numeric value
-            if not (lcd_state["dots"]["0.001"] or lcd_state["dots"]["0.01"] or 0.1*lcd_state["dots"]["0.1"]):
+            if not dots_state.any():
                 dot_multiplier = 1.0
             else:
-                dot_multiplier = (
-                     0.001*lcd_state["dots"]["0.001"] +
-                     0.01*lcd_state["dots"]["0.01"] +
-                     0.1*lcd_state["dots"]["0.1"]
-                     )
+                dot_multiplier = float(DOT_VALUES[dots_state].sum())
             total_value = (
                 digit_1E4 * 10_000 +
                 digit_1E3 * 1_000 +
@@ -417,37 +561,70 @@ def loop():
                 digit_1E0
             ) * dot_multiplier
             
-        active_modes = [mode for mode, on in lcd_state["modes"].items() if on]
+        active_modes = [MODE_INDICATORS[i] for i in np.flatnonzero(modes_state)]
         if not active_modes:
             mode_str = "unknown"
         else:
             # if you expect only one, you can just do active_modes[0]
             mode_str = "+".join(active_modes)
+
+        error_str = " | ".join(error_msgs)
+        error_msgs.clear()
+        last_reading = (roi_on, mode_str, total_value)
+    else:
+        # LCD unchanged: repeat the last reading, but not its decode warnings;
+        # they were logged with the frame that produced them
+        roi_on, mode_str, total_value = last_reading
+        error_str = ""
         
-        print(f"{mode_str}, {total_value:.4f} ")
-        
-        log_entry(csv_writer, mode_str, total_value, error_msg, logfile)
-        error_msg = ""
+    if show_frame:
+        frame_annotated_color = annot_color
+    
+        ##### Annotate frame with date
+    
+    
+        # args: image, text, org (x,y), font, fontScale, color (BGR), thickness, lineType
+        cv2.putText(
+            frame_annotated_color,
+            timestamp,
+            (10, 30),                             # position in pixels from top-left
+            cv2.FONT_HERSHEY_SIMPLEX,             # font face
+            0.6,                                  # font scale (size)
+            (0, 200, 0),                   # font color (white)
+            1,                                    # thickness
+            cv2.LINE_AA                           # anti-aliased line
+        )
 
-        # Display
-        cv2.imshow(window_name, frame_annotated_color)
+        ### Draw colored ROI boxes for all ROIs, marking the ones that are on
+        draw_roi_overlay(frame_annotated_color, roi_on)
 
-        # Handle key & exit condition
-        key = cv2.waitKey(1) & 0xFF
-        if key == ord('q'):
-            return False
+    print(f"{mode_str}, {total_value:.4f} ")
+    
+    log_entry(mode_str, total_value, error_str, logfile)
+
+    # Display, at reduced size. INTER_AREA rather than INTER_NEAREST so the
+    # 1 px ROI boxes don't drop out when scaled down.
+    if show_frame:
+        cv2.imshow(window_name, cv2.resize(frame_annotated_color, None,
+                                           fx=DISPLAY_SCALE, fy=DISPLAY_SCALE,
+                                           interpolation=cv2.INTER_AREA))
+
+    # Handle key & exit condition (every frame, so 'q' is never missed)
+    key = cv2.pollKey() & 0xFF
+    if key == ord('q'):
+        return False
 
     return True
 
 
 
 def main():
-    global logfile, csvwriter
+    global logfile
     try:
         # -- initialize once --
         setup(resolution=(800, 600), framerate=30)
 
-        logfile, csv_writer = init_logger()
+        logfile = init_logger()
 
         # -- then run loop until it returns False --
         while loop():
@@ -455,6 +632,7 @@ def main():
 
     finally:
         # -- cleanup when done or on error --
+        stop_capture()
         picam2.stop()
         cv2.destroyAllWindows()
         logfile.close()
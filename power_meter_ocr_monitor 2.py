@@ -1,14 +1,15 @@
 #!/usr/bin/env python3
 import argparse
 import cv2
+import numpy as np
 import time
-from picamera2 import Picamera2
+from picamera2 import MappedArray, Picamera2
 from datetime import datetime
-import math
 import os
-import csv
+import queue
 import signal
 import sys
+import threading
 
 ### Run with  --no-preview to run headless, with no camera display.
 
@@ -27,6 +28,7 @@ import sys
 # Group=paulwb
 # WorkingDirectory=/home/paulwb/Documents/GitHub/power-ocr-meter
 # Environment=PYTHONUNBUFFERED=1
+# Nice=-5
 # ExecStartPre=/bin/sleep 5
 # ExecStart=/usr/bin/python3 /home/paulwb/Documents/GitHub/power-ocr-meter/power_meter_ocr_monitor.py --no-preview --interval 0.35 --resolution 800x600 --log-dir logs
 # Restart=always
@@ -70,7 +72,8 @@ def parse_args():
     p.add_argument("--log-dir", default="logs",
                    help='Directory for CSV logs (default: "logs").')
     p.add_argument("--resolution", default="800x600",
-                   help="Camera resolution as WxH (default: 800x600).")
+                   help="Camera resolution as WxH; must cover the LCD ROIs, "
+                        "at least 731x412 (default: 800x600).")
     return p.parse_args()
 
 
@@ -90,11 +93,23 @@ RESOLUTION = parse_res(args.resolution)
 # -------- globals --------
 last_capture_time = 0.0
 picam2 = None
+frame_size = None     # (w, h) of the main stream, as configured by the camera
+overlay_bgr = None    # static ROI boxes for the preview, see build_roi_overlay()
+overlay_mask = None   # (h, w, 1) bool, True on overlay_bgr's box pixels
+annot_color = None    # (h, w, 3) BGR preview frame, reused every frame
+thresh_buf = None     # thresholded LCD crop, reused every frame
+TS_BAND_H = 40        # preview rows holding the timestamp, cleared every frame
+frame_queue = queue.Queue(maxsize=2)  # camera requests from the capture thread, oldest first
+capture_stop = threading.Event()
+capture_lock = threading.Lock()  # orders the producer's put against stop_capture()'s drain
+capture_thread = None
 window_name = "PiCam Live Preview (press 'q' to quit)"
-error_msg = ""
+error_msgs = []        # decode warnings since the last log row, oldest first
+MAX_ERROR_MSGS = 16    # keep only the newest ones, so a broken LCD can't grow this forever
 logfile = None
-csv_writer = None
-RUNNING = True  # toggled by signal handlers
+FLUSH_EVERY = 30       # CSV rows between flush + fsync; whatever is left goes out on exit
+rows_since_sync = 0
+stop_requested = threading.Event()  # set by the signal handlers
 
 # Global offsets/ROIs (unchanged from your code)
 roi_offs_x = 0
@@ -129,11 +144,10 @@ SEGMENT_NAMES = ["a", "b", "c", "d", "e", "f", "g"]
 DOT_NAMES = ["0.001", "0.01", "0.1"]
 DIGIT_NAMES = ["1E4", "1E3", "1E2", "1E1", "1E0"]
 
-lcd_state = {
-    "digits": { name: { seg: False for seg in SEGMENT_NAMES } for name in DIGIT_NAMES },
-    "dots":   { name: False for name in DOT_NAMES },
-    "modes":  { mode: False for mode in MODE_INDICATORS }
-}
+# LCD state, one 0/1 flag per ROI, indexed like the name lists above
+digits_state = np.zeros((len(DIGIT_NAMES), len(SEGMENT_NAMES)), dtype=np.uint8)
+dots_state = np.zeros(len(DOT_NAMES), dtype=np.uint8)
+modes_state = np.zeros(len(MODE_INDICATORS), dtype=np.uint8)
 
 SEGMENT_DIGIT_MAP = {
     frozenset(): 0,
@@ -149,47 +163,90 @@ SEGMENT_DIGIT_MAP = {
     frozenset(["a","b","c","d","f","g"]): 9,
 }
 
+# Same mapping, indexed by a 7-bit mask where bit i is set when
+# SEGMENT_NAMES[i] is lit; None for unrecognized patterns.
+DECODE_TABLE = [None] * 128
+for _segments, _digit in SEGMENT_DIGIT_MAP.items():
+    DECODE_TABLE[sum(1 << SEGMENT_NAMES.index(seg) for seg in _segments)] = _digit
+DECODE_TABLE_ARR = np.array([-1 if d is None else d for d in DECODE_TABLE], dtype=np.int8)  # -1 = unrecognized
+
 def init_logger():
-    global logfile, csv_writer
+    global logfile
     os.makedirs(LOG_DIR, exist_ok=True)
     fname = datetime.now().strftime("%Y%m%d_%H%M%S") + ".csv"
     path = os.path.join(LOG_DIR, fname)
-    logfile = open(path, "w", newline="")
-    csv_writer = csv.writer(logfile)
-    csv_writer.writerow(["date", "time", "mode", "value", "error"])
+    logfile = open(path, "w", newline="", buffering=8192)
+    # rows end in \r\n like csv.writer's
+    logfile.write("date,time,mode,value,error\r\n")
+    sync_log(logfile)
+    return logfile
+
+def sync_log(logfile):
+    # Push the buffered rows all the way to the SD card
+    global rows_since_sync
     logfile.flush()
-    return logfile, csv_writer
-
-def log_entry(writer, mode, value, error_msg, logfile):
-    now = datetime.now()
-    date_str = now.strftime("%Y-%m-%d")
-    tenth = now.microsecond // 100000
-    time_str = f"{now:%H:%M:%S}.{tenth}"
-    writer.writerow([date_str, time_str, mode, f"{value:.4f}", error_msg or ""])
-    logfile.flush()
-
-def decode_digit(segments: dict[str, bool]) -> int | None:
-    global error_msg
-    on_segments = { seg for seg, lit in segments.items() if lit }
-    digit = SEGMENT_DIGIT_MAP.get(frozenset(on_segments))
+    os.fsync(logfile.fileno())
+    rows_since_sync = 0
+
+_ts_cache_epoch = 0   # second that the cached strings below were formatted for
+_ts_cache_date = ""   # "YYYY-MM-DD"
+_ts_cache_hms = ""    # "HH:MM:SS"
+
+def _update_ts_cache(now):
+    # Reformat the date and time-of-day strings only when the second changes;
+    # returns the whole second of now
+    global _ts_cache_epoch, _ts_cache_date, _ts_cache_hms
+    sec = int(now)
+    if sec != _ts_cache_epoch:
+        _ts_cache_date, _ts_cache_hms = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(sec)).split(" ")
+        _ts_cache_epoch = sec
+    return sec
+
+def format_timestamp(now):
+    """
+    Format a time.time() value as "YYYY-MM-DD HH:MM:SS.ffffff". The part
+    up to the seconds only changes once a second, so it is cached.
+    """
+    sec = _update_ts_cache(now)
+    return f"{_ts_cache_date} {_ts_cache_hms}.{int((now - sec) * 1e6):06d}"
+
+def csv_field(text: str) -> str:
+    # Quote a free-text CSV field the way csv.writer does (QUOTE_MINIMAL); the
+    # other fields are numbers and fixed names that never need it
+    if any(c in text for c in ',"\r\n'):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+def log_entry(mode, value, error_msg, logfile):
+    global rows_since_sync
+    now = time.time()
+    sec = _update_ts_cache(now)
+    date_str = _ts_cache_date
+    tenth = int((now - sec) * 10)
+    time_str = f"{_ts_cache_hms}.{tenth}"
+    logfile.write(f"{date_str},{time_str},{mode},{value:.4f},{csv_field(error_msg or '')}\r\n")
+    rows_since_sync += 1
+    if rows_since_sync >= FLUSH_EVERY:
+        sync_log(logfile)
+
+def decode_digit(mask: int) -> int | None:
+    # mask: 7-bit segment mask of one digit, bit i set when SEGMENT_NAMES[i] is lit
+    digit = DECODE_TABLE[mask]
     if digit is None:
-        error = f"Warning: decode_digit got unrecognized segment pattern: {sorted(on_segments)}"
-        error_msg = (error_msg + " | " if error_msg else "") + error
+        on_segments = [seg for i, seg in enumerate(SEGMENT_NAMES) if mask >> i & 1]
+        error = f"Warning: decode_digit got unrecognized segment pattern: {on_segments}"
+        error_msgs.append(error)
+        if len(error_msgs) > MAX_ERROR_MSGS:
+            del error_msgs[0]
         print(error)
     return digit
 
-def evaluate_roi(frame_thresh, roi_tuple, on_threshold=50):
-    x1, y1, x2, y2 = roi_tuple
-    roi_image = frame_thresh[y1:y2, x1:x2]
-    white_pixels = cv2.countNonZero(roi_image)
-    total_pixels = roi_image.shape[0] * roi_image.shape[1]
-    black_pixels = float(total_pixels) - white_pixels
-    return black_pixels >= on_threshold
-
 def get_digit_sub_roi(digit_roi):
+    # Integer math throughout: all coords, offsets and sizes are ints, so // gives
+    # the same boxes as math.floor() of the float version
     dx1, dy1, dx2, dy2 = digit_roi
-    x_middle = dx1 + (dx2 - dx1)/2.0
-    y_middle = dy1 + (dy2 - dy1)/2.0
+    x_middle = dx1 + (dx2 - dx1) // 2
+    y_middle = dy1 + (dy2 - dy1) // 2
     short_size = 20
     long_size = 40
     offset_lateral = 36
@@ -197,152 +254,279 @@ def get_digit_sub_roi(digit_roi):
     y_seg_offset_side_top = -42
     y_seg_offset_side_bott = 46
     y_seg_offset_bott = 87
-    roi_top =  (math.floor(x_middle - short_size/2), math.floor(y_middle + y_seg_offset_top - long_size/2),
-                math.floor(x_middle + short_size/2), math.floor(y_middle + y_seg_offset_top + long_size/2))
-    roi_bott = (math.floor(x_middle - short_size/2), math.floor(y_middle + y_seg_offset_bott - long_size/2),
-                math.floor(x_middle + short_size/2), math.floor(y_middle + y_seg_offset_bott + long_size/2))
-    roi_midd = (math.floor(x_middle - short_size/2), math.floor(y_middle  - long_size/2),
-                math.floor(x_middle + short_size/2), math.floor(y_middle + long_size/2))
-    roi_tl =  (math.floor(x_middle - offset_lateral - long_size/2), math.floor(y_middle + y_seg_offset_side_top - short_size/2),
-                math.floor(x_middle - offset_lateral + long_size/2), math.floor(y_middle + y_seg_offset_side_top + short_size/2))
-    roi_tr =  (math.floor(x_middle + offset_lateral - long_size/2), math.floor(y_middle + y_seg_offset_side_top - short_size/2),
-                math.floor(x_middle + offset_lateral + long_size/2), math.floor(y_middle + y_seg_offset_side_top + short_size/2))
-    roi_bl =  (math.floor(x_middle - offset_lateral - long_size/2), math.floor(y_middle + y_seg_offset_side_bott - short_size/2),
-                math.floor(x_middle - offset_lateral + long_size/2), math.floor(y_middle + y_seg_offset_side_bott + short_size/2))
-    roi_br =  (math.floor(x_middle + offset_lateral - long_size/2), math.floor(y_middle + y_seg_offset_side_bott - short_size/2),
-                math.floor(x_middle + offset_lateral + long_size/2), math.floor(y_middle + y_seg_offset_side_bott + short_size/2))
+    hs = short_size // 2
+    hl = long_size // 2
+    roi_top =  (x_middle - hs, y_middle + y_seg_offset_top - hl,
+                x_middle + hs, y_middle + y_seg_offset_top + hl)
+    roi_bott = (x_middle - hs, y_middle + y_seg_offset_bott - hl,
+                x_middle + hs, y_middle + y_seg_offset_bott + hl)
+    roi_midd = (x_middle - hs, y_middle - hl,
+                x_middle + hs, y_middle + hl)
+    roi_tl =  (x_middle - offset_lateral - hl, y_middle + y_seg_offset_side_top - hs,
+                x_middle - offset_lateral + hl, y_middle + y_seg_offset_side_top + hs)
+    roi_tr =  (x_middle + offset_lateral - hl, y_middle + y_seg_offset_side_top - hs,
+                x_middle + offset_lateral + hl, y_middle + y_seg_offset_side_top + hs)
+    roi_bl =  (x_middle - offset_lateral - hl, y_middle + y_seg_offset_side_bott - hs,
+                x_middle - offset_lateral + hl, y_middle + y_seg_offset_side_bott + hs)
+    roi_br =  (x_middle + offset_lateral - hl, y_middle + y_seg_offset_side_bott - hs,
+                x_middle + offset_lateral + hl, y_middle + y_seg_offset_side_bott + hs)
     return (roi_top, roi_tr, roi_br, roi_bott, roi_bl, roi_tl, roi_midd)
 
+# Digit ROIs are fixed, so their segment ROIs only need computing once
+DIGIT_SEGMENT_ROIS = [get_digit_sub_roi(r) for r in array_of_digit_rois]
+SEG_ROI_ARRAY = np.array(DIGIT_SEGMENT_ROIS, dtype=np.int32)  # the same boxes, shape (5, 7, 4)
+
+def roi_outlines(rois):
+    # (N, 4, 2) int32 closed quads (display offsets applied), as cv2.polylines/fillPoly take them
+    return np.array([
+        [(x1 + roi_offs_x, y1 + roi_offs_y), (x2 + roi_offs_x, y1 + roi_offs_y),
+         (x2 + roi_offs_x, y2 + roi_offs_y), (x1 + roi_offs_x, y2 + roi_offs_y)]
+        for x1, y1, x2, y2 in rois
+    ], dtype=np.int32)
+
+# Preview boxes grouped by color (BGR): one polylines() call per group
+ROI_OUTLINE_GROUPS = [
+    (roi_outlines(array_of_dot_rois), (255, 0, 0)),
+    (roi_outlines(array_of_mode_rois), (0, 255, 0)),
+    (roi_outlines(array_of_digit_rois), (0, 0, 255)),
+    (roi_outlines(SEG_ROI_ARRAY.reshape(-1, 4).tolist()), (255, 0, 255)),
+]
+# Small "lit" marker in the bottom-right corner of each evaluated ROI: dots, modes, then segments
+LIT_MARKERS = roi_outlines([
+    (x2 - 5, y2 - 5, x2, y2)
+    for x1, y1, x2, y2 in array_of_dot_rois + array_of_mode_rois + SEG_ROI_ARRAY.reshape(-1, 4).tolist()
+])
+
+# Every evaluated ROI as one (N, 4) table, in LIT_MARKERS order
+ROI_ON_THRESHOLD = 100  # black pixels needed for an ROI to count as "on"
+ALL_ROIS = np.concatenate((array_of_dot_rois, array_of_mode_rois,
+                           SEG_ROI_ARRAY.reshape(-1, 4))).astype(np.intp)
+ROI_AREAS = (ALL_ROIS[:, 2] - ALL_ROIS[:, 0]) * (ALL_ROIS[:, 3] - ALL_ROIS[:, 1])
+N_DOTS = len(array_of_dot_rois)
+N_MODES = len(array_of_mode_rois)
+
+# Only the LCD's bounding box (the union of all ROIs) gets thresholded and
+# integrated; CROP_ROIS are the same ROIs relative to the crop's top-left corner
+CROP_X1, CROP_Y1 = ALL_ROIS[:, :2].min(axis=0).tolist()
+CROP_X2, CROP_Y2 = ALL_ROIS[:, 2:].max(axis=0).tolist()
+CROP_ROIS = ALL_ROIS - np.array([CROP_X1, CROP_Y1, CROP_X1, CROP_Y1])
+integral_buf = np.empty((CROP_Y2 - CROP_Y1 + 1, CROP_X2 - CROP_X1 + 1), dtype=np.int32)  # reused every frame
+
+def evaluate_rois(frame_thresh):
+    # frame_thresh: the 0/255 thresholded crop (see CROP_ROIS)
+    # on/off of every ROI in ALL_ROIS, from one summed-area table of the crop:
+    # four lookups per ROI instead of a slice + countNonZero each
+    S = cv2.integral(frame_thresh, integral_buf, sdepth=cv2.CV_32S)
+    x1, y1, x2, y2 = CROP_ROIS.T
+    white = (S[y2, x2] - S[y1, x2] - S[y2, x1] + S[y1, x1]) // 255
+    return ROI_AREAS - white >= ROI_ON_THRESHOLD
+
+def build_roi_overlay():
+    # The ROI boxes never move: render them once, with a mask of where they are
+    global overlay_bgr, overlay_mask
+    w, h = frame_size
+    overlay_bgr = np.zeros((h, w, 3), np.uint8)
+    for outlines, color in ROI_OUTLINE_GROUPS:
+        cv2.polylines(overlay_bgr, outlines, True, color, 1)
+    overlay_mask = overlay_bgr.any(axis=2, keepdims=True)
+
+def draw_roi_overlay(frame_bgr, roi_on):
+    # pre-rendered ROI boxes in one masked copy, then a filled red marker on every ROI that is on
+    np.copyto(frame_bgr, overlay_bgr, where=overlay_mask)
+    if roi_on.any():
+        cv2.fillPoly(frame_bgr, LIT_MARKERS[roi_on], (0, 0, 255))
+
+def luma_view(yuv):
+    # Y plane of a mapped YUV420 frame ((h * 3/2, stride) array) as an (h, w) view (no copy);
+    # this is the grayscale image
+    w, h = frame_size
+    return yuv[:h, :w]
+
 def setup(resolution=(640, 480), framerate=30, preview=False):
-    global last_capture_time, picam2
-    last_capture_time = time.time() - CAPTURE_INTERVAL
+    global last_capture_time, picam2, frame_size, capture_thread, annot_color, thresh_buf
+    last_capture_time = time.monotonic() - CAPTURE_INTERVAL
+
+    # Make sure OpenCV uses its SIMD kernels, and give the parallel ones
+    # (threshold, resize, cvtColor, ...) half the cores
+    cv2.setUseOptimized(True)
+    cv2.setNumThreads(max(2, (os.cpu_count() or 1) // 2))
+    print(f"OpenCV optimized: {cv2.useOptimized()}, threads: {cv2.getNumThreads()}")
 
     picam2 = Picamera2()
 
     # No built-in preview; rely on OpenCV window only
+    # YUV420 so the Y plane can be used as grayscale directly; no lores stream, nothing reads it
+    # buffer_count: the capture thread may hold 3 requests (2 queued + 1 in loop())
     config = picam2.create_preview_configuration(
-        main={"size": resolution},
-        lores={"size": resolution}
+        main={"size": resolution, "format": "YUV420"},
         # note: intentionally NO display="main"
+        buffer_count=6,
+        controls={"FrameRate": framerate}
     )
     picam2.configure(config)
+    frame_size = picam2.stream_configuration("main")["size"]
+    # The LCD crop is sliced straight out of every frame, so the ROIs must fit in it
+    if frame_size[0] < CROP_X2 or frame_size[1] < CROP_Y2:
+        raise RuntimeError(f"Frame {frame_size[0]}x{frame_size[1]} is smaller than the LCD ROIs "
+                           f"need ({CROP_X2}x{CROP_Y2}); use a larger --resolution.")
+    thresh_buf = np.empty((CROP_Y2 - CROP_Y1, CROP_X2 - CROP_X1), dtype=np.uint8)
     picam2.start()
     time.sleep(0.1)
+    capture_thread = threading.Thread(target=capture_frames, name="capture", daemon=True)
+    capture_thread.start()
 
     if preview:
         cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)  # WINDOW_NORMAL plays nicer over NX
-
-def compute_dot_multiplier(dots: dict[str, bool]) -> float:
-    # priority: 0.1, 0.01, 0.001; default 1.0
-    if dots["0.1"]:
-        return 0.1
-    if dots["0.01"]:
-        return 0.01
-    if dots["0.001"]:
-        return 0.001
-    return 1.0
+        build_roi_overlay()
+        w, h = frame_size
+        annot_color = np.full((h, w, 3), 255, dtype=np.uint8)  # white outside the LCD crop
+
+def capture_frames():
+    """
+    Producer thread: keep the newest camera requests queued for loop(), so a
+    slow iteration (preview, logging) never stalls the camera. When loop()
+    falls behind, the oldest queued request is dropped and released.
+    """
+    while True:
+        request = picam2.capture_request()
+        with capture_lock:
+            if capture_stop.is_set():
+                # stop_capture() has drained (or is about to drain) the queue
+                request.release()
+                return
+            if frame_queue.full():
+                try:
+                    frame_queue.get_nowait().release()
+                except queue.Empty:
+                    pass
+            frame_queue.put_nowait(request)
+
+def next_frame(timeout=2.0):
+    """
+    Return the newest queued camera request, releasing any older ones.
+    The caller must release() the returned request.
+    """
+    request = frame_queue.get(timeout=timeout)
+    while True:
+        try:
+            newer = frame_queue.get_nowait()
+        except queue.Empty:
+            return request
+        request.release()
+        request = newer
+
+def stop_capture():
+    # Under the lock, so no request gets queued after the drain below; one still
+    # being captured is released by capture_frames() itself
+    with capture_lock:
+        capture_stop.set()
+    if capture_thread is not None:
+        capture_thread.join(timeout=1.0)
+    # hand any frames nobody consumed back to the camera
+    while True:
+        try:
+            frame_queue.get_nowait().release()
+        except queue.Empty:
+            break
+
+# Decimal point multiplier for every combination of lit dots, indexed by
+# bit i = dots[i]; priority: 0.1, 0.01, 0.001; default 1.0
+DOT_MULTIPLIERS = (1.0, 0.001, 0.01, 0.01, 0.1, 0.1, 0.1, 0.1)
+
+def compute_dot_multiplier(dots: np.ndarray) -> float:
+    # dots in DOT_NAMES order ("0.001", "0.01", "0.1")
+    d0, d1, d2 = dots.tolist()
+    return DOT_MULTIPLIERS[d0 | d1 << 1 | d2 << 2]
+
+def show_preview(frame_thresh, timestamp, roi_on):
+    # Thresholded frame in color with the timestamp and ROI overlay; False once 'q' is pressed.
+    # frame_thresh is the LCD crop: only that part and the timestamp band change per frame
+    frame_annotated_color = annot_color
+    cv2.cvtColor(frame_thresh, cv2.COLOR_GRAY2BGR, dst=annot_color[CROP_Y1:CROP_Y2, CROP_X1:CROP_X2])
+    annot_color[:TS_BAND_H] = 255
+    cv2.putText(frame_annotated_color, timestamp, (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 200, 0), 1, cv2.LINE_AA)
+    draw_roi_overlay(frame_annotated_color, roi_on)
+    cv2.imshow(window_name, frame_annotated_color)
+    return cv2.pollKey() & 0xFF != ord('q')
 
 def loop(preview=False):
-    global csv_writer, logfile, error_msg, last_capture_time
-    now = time.time()
-    if now - last_capture_time >= CAPTURE_INTERVAL:
-        rgb = picam2.capture_array()
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
-        frame_clean = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
-        frame_clean_gr_pre = cv2.cvtColor(frame_clean, cv2.COLOR_BGR2GRAY)
-        _, frame_clean_gr = cv2.threshold(frame_clean_gr_pre, 160, 255, cv2.THRESH_BINARY)
-
-        if preview:
-            frame_annotated_color = cv2.cvtColor(frame_clean_gr, cv2.COLOR_GRAY2BGR)
-            cv2.putText(frame_annotated_color, timestamp, (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 200, 0), 1, cv2.LINE_AA)
-
-        # Dots
-        for dot_name, dot_roi in zip(DOT_NAMES, array_of_dot_rois):
-            if preview:
-                x1, y1, x2, y2 = dot_roi
-                cv2.rectangle(frame_annotated_color, (x1 + roi_offs_x, y1 + roi_offs_y),
-                              (x2 + roi_offs_x, y2 + roi_offs_y), (255, 0, 0), 1)
-            roi_status = evaluate_roi(frame_clean_gr, dot_roi, on_threshold=100)
-            lcd_state["dots"][dot_name] = roi_status
-            if preview and roi_status:
-                x1, y1, x2, y2 = dot_roi
-                cv2.rectangle(frame_annotated_color, (x2 + roi_offs_x - 5, y2 + roi_offs_y - 5),
-                              (x2 + roi_offs_x, y2 + roi_offs_y), (0, 0, 255), -1)
-
-        # Modes
-        for mode_name, mode_roi in zip(MODE_INDICATORS, array_of_mode_rois):
-            if preview:
-                x1, y1, x2, y2 = mode_roi
-                cv2.rectangle(frame_annotated_color, (x1 + roi_offs_x, y1 + roi_offs_y),
-                              (x2 + roi_offs_x, y2 + roi_offs_y), (0, 255, 0), 1)
-            roi_status = evaluate_roi(frame_clean_gr, mode_roi, on_threshold=100)
-            lcd_state["modes"][mode_name] = roi_status
-            if preview and roi_status:
-                x1, y1, x2, y2 = mode_roi
-                cv2.rectangle(frame_annotated_color, (x2 + roi_offs_x - 5, y2 + roi_offs_y - 5),
-                              (x2 + roi_offs_x, y2 + roi_offs_y), (0, 0, 255), -1)
-
-        # Digits
-        for digit_name, digit_roi in zip(DIGIT_NAMES, array_of_digit_rois):
-            if preview:
-                x1, y1, x2, y2 = digit_roi
-                cv2.rectangle(frame_annotated_color, (x1 + roi_offs_x, y1 + roi_offs_y),
-                              (x2 + roi_offs_x, y2 + roi_offs_y), (0, 0, 255), 1)
-            segment_rois = get_digit_sub_roi(digit_roi)
-            for seg_name, segment_roi in zip(SEGMENT_NAMES, segment_rois):
-                if preview:
-                    sx1, sy1, sx2, sy2 = segment_roi
-                    cv2.rectangle(frame_annotated_color, (sx1 + roi_offs_x, sy1 + roi_offs_y),
-                                  (sx2 + roi_offs_x, sy2 + roi_offs_y), (255, 0, 255), 1)
-                roi_status = evaluate_roi(frame_clean_gr, segment_roi, on_threshold=100)
-                lcd_state["digits"][digit_name][seg_name] = roi_status
-                if preview and roi_status:
-                    sx1, sy1, sx2, sy2 = segment_roi
-                    cv2.rectangle(frame_annotated_color, (sx2 + roi_offs_x - 5, sy2 + roi_offs_y - 5),
-                                  (sx2 + roi_offs_x, sy2 + roi_offs_y), (0, 0, 255), -1)
-
-        # Decode number
-        digit_values = [decode_digit(lcd_state["digits"][name]) for name in DIGIT_NAMES]
-        if any(v is None for v in digit_values):
-            print("Warning: one or more segments failed to decode:", digit_values)
-            total_value = 0.0
-        else:
-            d4, d3, d2, d1, d0 = digit_values
-            dot_multiplier = compute_dot_multiplier(lcd_state["dots"])
-            total_value = (d4*10000 + d3*1000 + d2*100 + d1*10 + d0) * dot_multiplier
-
-        active_modes = [mode for mode, on in lcd_state["modes"].items() if on]
-        mode_str = "+".join(active_modes) if active_modes else "unknown"
-
-        print(f"{mode_str}, {total_value:.4f}")
-        log_entry(csv_writer, mode_str, total_value, error_msg, logfile)
-        error_msg = ""
-
-        if preview:
-            cv2.imshow(window_name, frame_annotated_color)
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q'):
-                return False
+    global logfile, last_capture_time
+    # Wait out the rest of the capture interval on a monotonic deadline; a signal
+    # ends the wait at once
+    remaining = CAPTURE_INTERVAL - (time.monotonic() - last_capture_time)
+    if stop_requested.wait(max(0.0, remaining)):
+        return False
+
+    # Read the frame in place from the camera buffer (no memcpy); it is only valid
+    # until the request is released, so threshold it into a new image first
+    try:
+        request = next_frame()
+    except queue.Empty:
+        # Camera hiccup: nothing arrived within next_frame()'s timeout; try again
+        # next interval rather than taking the whole logger down
+        print("[camera] no frame within 2 s, retrying")
+        return True
+    last_capture_time = time.monotonic()
+    timestamp = format_timestamp(time.time())
+    try:
+        with MappedArray(request, "main") as mapped:
+            # Only the LCD's bounding box is needed; the rest of the frame is never read
+            frame_clean_gr_pre = luma_view(mapped.array)[CROP_Y1:CROP_Y2, CROP_X1:CROP_X2]
+            _, frame_clean_gr = cv2.threshold(frame_clean_gr_pre, 160, 255, cv2.THRESH_BINARY,
+                                              dst=thresh_buf)
+    finally:
+        request.release()
+
+    # Dots, modes and digit segments in one pass (ALL_ROIS order)
+    roi_on = evaluate_rois(frame_clean_gr)
+    dots_state[:] = roi_on[:N_DOTS]
+    modes_state[:] = roi_on[N_DOTS:N_DOTS + N_MODES]
+    digits_state[:] = roi_on[N_DOTS + N_MODES:].reshape(digits_state.shape)
+
+    # Decode number: pack every digit's segments into a mask, then one table lookup
+    digit_masks = np.packbits(digits_state, axis=1, bitorder="little")[:, 0]
+    digits = DECODE_TABLE_ARR[digit_masks]
+    if (digits < 0).any():
+        # decode_digit() reports each unrecognized pattern
+        digit_values = [decode_digit(mask) for mask in digit_masks.tolist()]
+        print("Warning: one or more segments failed to decode:", digit_values)
+        total_value = 0.0
+    else:
+        d4, d3, d2, d1, d0 = digits.tolist()
+        dot_multiplier = compute_dot_multiplier(dots_state)
+        total_value = (d4*10000 + d3*1000 + d2*100 + d1*10 + d0) * dot_multiplier
+
+    active_modes = [mode for mode, on in zip(MODE_INDICATORS, modes_state) if on]
+    mode_str = "+".join(active_modes) if active_modes else "unknown"
+
+    print(f"{mode_str}, {total_value:.4f}")
+    log_entry(mode_str, total_value, " | ".join(error_msgs), logfile)
+    error_msgs.clear()
+
+    # The preview is all in one place, after the reading is logged; headless
+    # runs never touch any of it
+    if preview:
+        return show_preview(frame_clean_gr, timestamp, roi_on)
 
     return True
 
 # -------- signals --------
 def _handle_signal(signum, frame):
-    global RUNNING
-    RUNNING = False
+    stop_requested.set()
 
 signal.signal(signal.SIGINT, _handle_signal)
 signal.signal(signal.SIGTERM, _handle_signal)
 
 def main():
-    global logfile, csv_writer
+    global logfile
     try:
         setup(resolution=RESOLUTION, framerate=30, preview=args.preview)
-        logfile, csv_writer = init_logger()
-        while RUNNING and loop(preview=args.preview):
+        logfile = init_logger()
+        while not stop_requested.is_set() and loop(preview=args.preview):
             pass
     finally:
+        stop_capture()
         try:
             if picam2 is not None:
                 picam2.stop()
@@ -354,7 +538,9 @@ def main():
             except Exception:
                 pass
         try:
+            # SIGINT/SIGTERM only set stop_requested, so the unsynced rows are written out here
             if logfile is not None:
+                sync_log(logfile)
                 logfile.close()
         except Exception:
             pass
@@ -1,26 +1,43 @@
 #!/usr/bin/env python3
 import argparse
-import csv
 import cv2
-import math
+import numpy as np
 import os
+import queue
 import signal
 import subprocess
 import sys
+import threading
 import time
 from datetime import datetime
-from picamera2 import Picamera2
 
 try:
     cv2.setUseOptimized(True)  # usually already True, but explicit is fine
-    cv2.setNumThreads(1)       # keep CPU usage predictable (good for Pi/Zero 2 W)
 except Exception:
     pass
 
+NUMBA_AVAILABLE = False
+try:
+    # numba kernel next to this script, see ocr_kernel.py
+    from ocr_kernel import otsu_level, process_frame
+    NUMBA_AVAILABLE = True
+except Exception:
+    NUMBA_AVAILABLE = False  # OpenCV + NumPy path in read_lcd()
+
 # ============================================================
 # CLI
 # ============================================================
 
+def parse_cpus(s):
+    # "2,3" -> {2, 3}; "" -> empty set (affinity left alone)
+    try:
+        cpus = {int(c) for c in s.split(",") if c.strip()}
+    except ValueError:
+        cpus = None
+    if cpus is None or any(c < 0 for c in cpus):
+        raise argparse.ArgumentTypeError(f"expected comma separated core numbers, got {s!r}")
+    return cpus
+
 def parse_args():
     p = argparse.ArgumentParser(description="Power meter OCR logger")
 
@@ -37,7 +54,11 @@ def parse_args():
     p.add_argument("--log-dir", default="logs",
                    help='Directory for CSV logs (default: "logs").')
     p.add_argument("--resolution", default="800x600",
-                   help="Camera resolution as WxH (default: 800x600).")
+                   help="Camera resolution as WxH; must cover the LCD ROIs, "
+                        "at least 731x412 (default: 800x600).")
+    p.add_argument("--cpus", type=parse_cpus, default="2,3",
+                   help='CPU cores for the OCR thread, comma separated; "" leaves the '
+                        'affinity alone (default: 2,3, away from the IRQ-heavy cores 0 and 1).')
 
     # Persist LiFePO4wered policy to flash (CFG_WRITE 0x46)
     p.add_argument("--lp4w-persist", action="store_true",
@@ -57,26 +78,37 @@ def parse_res(s):
 CAPTURE_INTERVAL = args.interval
 LOG_DIR = args.log_dir
 RESOLUTION = parse_res(args.resolution)
+OCR_CPUS = args.cpus
+
+# CSV flush tuning: the writer thread batches rows and writes them out every
+# FLUSH_EVERY rows, or once the oldest pending row is FLUSH_MAX_AGE_S old
+FLUSH_EVERY = 20
+FLUSH_MAX_AGE_S = 5.0
 
-# CSV flush tuning
-FLUSH_EVERY = 10
-ROWS_SINCE_FLUSH = 0
+# LiFePO4wered + temperature polling: read every TELEMETRY_PERIOD_S on a background
+# thread; readings older than TELEMETRY_MAX_AGE_S are logged as blank
+TELEMETRY_PERIOD_S = 1.0
+TELEMETRY_MAX_AGE_S = 5.0
 
 # ============================================================
 # LiFePO4wered integration
 # ============================================================
 
-LP4W_AVAILABLE = False
-try:
-    # Python binding from https://github.com/xorbit/LiFePO4wered-Pi
-    from lifepo4wered import (
-        read_lifepo4wered, write_lifepo4wered,
-        VBAT, VIN, IOUT,
-        AUTO_BOOT, AUTO_SHDN_TIME, VIN_THRESHOLD, CFG_WRITE
-    )
-    LP4W_AVAILABLE = True
-except Exception:
-    LP4W_AVAILABLE = False  # we'll fall back to CLI if present
+# The binding is only imported on the first LP4W call, so importing this module
+# (tests, non-Pi machines) does not need it
+LP4W_AVAILABLE = None  # None until _ensure_lp4w_loaded() has run
+lp4w = None
+
+def _ensure_lp4w_loaded() -> bool:
+    global LP4W_AVAILABLE, lp4w
+    if LP4W_AVAILABLE is None:
+        try:
+            # Python binding from https://github.com/xorbit/LiFePO4wered-Pi
+            import lifepo4wered as lp4w
+            LP4W_AVAILABLE = True
+        except Exception:
+            LP4W_AVAILABLE = False  # we'll fall back to CLI if present
+    return LP4W_AVAILABLE
 
 def _cli_get(name: str) -> int:
     out = subprocess.check_output(["lifepo4wered-cli", "get", name], text=True).strip()
@@ -89,19 +121,19 @@ def _cli_set(name: str, value: int) -> None:
     subprocess.check_call(["lifepo4wered-cli", "set", name, str(value)])
 
 def lp4w_get_vbat_mV() -> int:
-    return read_lifepo4wered(VBAT) if LP4W_AVAILABLE else _cli_get("VBAT")
+    return lp4w.read_lifepo4wered(lp4w.VBAT) if _ensure_lp4w_loaded() else _cli_get("VBAT")
 
 def lp4w_get_vin_mV() -> int:
-    return read_lifepo4wered(VIN) if LP4W_AVAILABLE else _cli_get("VIN")
+    return lp4w.read_lifepo4wered(lp4w.VIN) if _ensure_lp4w_loaded() else _cli_get("VIN")
 
 def lp4w_get_iout_mA() -> int:
-    return read_lifepo4wered(IOUT) if LP4W_AVAILABLE else _cli_get("IOUT")
+    return lp4w.read_lifepo4wered(lp4w.IOUT) if _ensure_lp4w_loaded() else _cli_get("IOUT")
 
 def lp4w_set_vin_threshold_mV(value: int, persist: bool):
-    if LP4W_AVAILABLE:
-        write_lifepo4wered(VIN_THRESHOLD, value)
+    if _ensure_lp4w_loaded():
+        lp4w.write_lifepo4wered(lp4w.VIN_THRESHOLD, value)
         if persist:
-            write_lifepo4wered(CFG_WRITE, 0x46)
+            lp4w.write_lifepo4wered(lp4w.CFG_WRITE, 0x46)
     else:
         _cli_set("VIN_THRESHOLD", value)
         if persist:
@@ -114,11 +146,11 @@ def lp4w_apply_config(delay_minutes: int, auto_boot_mode: int, persist: bool):
       - AUTO_BOOT:      3 = AUTO_BOOT_VIN (boot only when VIN present)
     """
     try:
-        if LP4W_AVAILABLE:
-            write_lifepo4wered(AUTO_SHDN_TIME, delay_minutes)
-            write_lifepo4wered(AUTO_BOOT,      auto_boot_mode)
+        if _ensure_lp4w_loaded():
+            lp4w.write_lifepo4wered(lp4w.AUTO_SHDN_TIME, delay_minutes)
+            lp4w.write_lifepo4wered(lp4w.AUTO_BOOT,      auto_boot_mode)
             if persist:
-                write_lifepo4wered(CFG_WRITE, 0x46)
+                lp4w.write_lifepo4wered(lp4w.CFG_WRITE, 0x46)
         else:
             _cli_set("AUTO_SHDN_TIME", delay_minutes)
             _cli_set("AUTO_BOOT", auto_boot_mode)
@@ -204,6 +236,31 @@ def read_named_temps():
             break
 
     return soc, rp1, pmic
+
+def poll_telemetry():
+    """
+    Background thread: read the LiFePO4wered telemetry (I2C) and the board
+    temperatures every TELEMETRY_PERIOD_S and publish them in telemetry, so a
+    slow read never delays a capture. Stops once stop_requested is set.
+    """
+    global telemetry
+    while True:
+        vbat = vin = iout = None
+        try:
+            vbat = lp4w_get_vbat_mV()
+            vin  = lp4w_get_vin_mV()
+            iout = lp4w_get_iout_mA()
+        except Exception as e:
+            print(f"[LiFePO4wered] read failed: {e}")
+        soc_C = rp1_C = pmic_C = None
+        try:
+            soc_C, rp1_C, pmic_C = read_named_temps()
+        except Exception as e:
+            print(f"[temps] read failed: {e}")
+        # One tuple assignment, so loop() never sees half an update
+        telemetry = (time.monotonic(), vbat, vin, iout, soc_C, rp1_C, pmic_C)
+        if stop_requested.wait(TELEMETRY_PERIOD_S):
+            return
     
 # ============================================================
 # OCR / decoding state
@@ -211,11 +268,28 @@ def read_named_temps():
 
 last_capture_time = 0.0
 picam2 = None
+MappedArray = None    # picamera2.MappedArray, imported in setup()
+frame_size = None     # (w, h) of the main stream, as configured by the camera
+annot_buf = None      # (h, w, 3) BGR preview frame, reused every capture (--preview only)
+overlay_crop = None   # ROI boxes inside OVERLAY_BOX, see build_roi_overlay()
+overlay_mask = None   # (h, w, 1) bool over OVERLAY_BOX, True on overlay_crop's box pixels
+frame_queue = queue.Queue(maxsize=2)  # (request, received_at) from the capture thread, oldest first
+capture_stop = threading.Event()
+capture_lock = threading.Lock()  # orders the producer's put against stop_capture()'s drain
+capture_thread = None
 window_name = "PiCam Live Preview (press 'q' to quit)"
-error_msg = ""
+TS_BAND_H = 40        # preview rows holding the timestamp, cleared every frame
+preview_queue = queue.Queue(maxsize=1)  # newest (crop, timestamp, roi_on) for the preview thread, None = stop
+preview_thread = None
+error_msgs = []        # decode warnings since the last log row, oldest first
+MAX_ERROR_MSGS = 16    # keep only the newest ones, so a broken LCD can't grow this forever
 logfile = None
-csv_writer = None
-RUNNING = True  # toggled by signal handlers
+log_queue = queue.Queue(maxsize=256)  # CSV rows from loop() to the writer thread, None = stop
+log_thread = None
+log_dropped = 0        # rows lost because the writer thread fell behind
+stop_requested = threading.Event()  # set by the signal handlers and by 'q' in the preview window
+telemetry = None       # (monotonic time, vbat_mV, vin_mV, iout_mA, soc_C, rp1_C, pmic_C) from poll_telemetry()
+telemetry_thread = None
 
 # Global offsets/ROIs
 roi_offs_x = 0
@@ -250,11 +324,10 @@ SEGMENT_NAMES = ["a", "b", "c", "d", "e", "f", "g"]
 DOT_NAMES = ["0.001", "0.01", "0.1"]
 DIGIT_NAMES = ["1E4", "1E3", "1E2", "1E1", "1E0"]
 
-lcd_state = {
-    "digits": { name: { seg: False for seg in SEGMENT_NAMES } for name in DIGIT_NAMES },
-    "dots":   { name: False for name in DOT_NAMES },
-    "modes":  { mode: False for mode in MODE_INDICATORS }
-}
+# LCD state, indexed like the name lists above, overwritten on every capture
+digit_masks = np.zeros(len(DIGIT_NAMES), dtype=np.uint8)  # 7-bit segment mask per digit, see SEGMENT_BITMASK_LUT
+dots_state = np.zeros(len(DOT_NAMES), dtype=bool)
+modes_state = np.zeros(len(MODE_INDICATORS), dtype=bool)
 
 SEGMENT_DIGIT_MAP = {
     frozenset(): 0,
@@ -270,78 +343,155 @@ SEGMENT_DIGIT_MAP = {
     frozenset(["a","b","c","d","f","g"]): 9,
 }
 
+# SEGMENT_DIGIT_MAP indexed by a 7-bit mask (bit i set = SEGMENT_NAMES[i] lit),
+# None for unrecognized patterns
+SEGMENT_BITMASK_LUT = [None] * 128
+for _segments, _digit in SEGMENT_DIGIT_MAP.items():
+    SEGMENT_BITMASK_LUT[sum(1 << SEGMENT_NAMES.index(seg) for seg in _segments)] = _digit
+SEGMENT_BITMASK_LUT_ARR = np.array([-1 if d is None else d for d in SEGMENT_BITMASK_LUT], dtype=np.int8)
+SEGMENT_SHIFTS = np.arange(len(SEGMENT_NAMES))
+
 # ============================================================
 # Logging
 # ============================================================
 
+_ts_cache_day = 0    # dt.toordinal() that _ts_cache_date was formatted for
+_ts_cache_date = ""  # "YYYY-MM-DD"
+
 def _fmt_ts(dt: datetime) -> str:
-    # Format: YYYY-MM-DD HH:MM:SS.mmm (ms precision)
-    return f"{dt:%Y-%m-%d %H:%M:%S}.{dt.microsecond // 1000:03d}"
+    # Format: YYYY-MM-DD HH:MM:SS.mmm (ms precision), straight from the datetime's
+    # fields; the date part only changes at midnight, so it is cached
+    global _ts_cache_day, _ts_cache_date
+    day = dt.toordinal()
+    if day != _ts_cache_day:
+        _ts_cache_date = f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d}"
+        _ts_cache_day = day
+    return f"{_ts_cache_date} {dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}.{dt.microsecond // 1000:03d}"
 
 def init_logger():
-    global logfile, csv_writer, ROWS_SINCE_FLUSH
+    global logfile, log_thread
     os.makedirs(LOG_DIR, exist_ok=True)
     fname = datetime.now().strftime("%Y%m%d_%H%M%S") + ".csv"
     path = os.path.join(LOG_DIR, fname)
-    logfile = open(path, "w", newline="")
-    csv_writer = csv.writer(logfile)
-    # Combined timestamp + power metrics
-    csv_writer.writerow(["timestamp", "mode", "value",
-                         "vbat_mV", "vin_mV", "iout_mA",
-                         "soc_C", "rp1_C", "pmic_C",
-                         "error"])
+    logfile = open(path, "w", newline="", buffering=1 << 16)
+    # Combined timestamp + power metrics; rows end in \r\n like csv.writer's
+    logfile.write("timestamp,mode,value,vbat_mV,vin_mV,iout_mA,soc_C,rp1_C,pmic_C,error\r\n")
     logfile.flush()
-    ROWS_SINCE_FLUSH = 0
+    log_thread = threading.Thread(target=log_writer, name="csv-writer", daemon=True)
+    log_thread.start()
     
-    return logfile, csv_writer
+    return logfile
+
+def csv_field(text: str) -> str:
+    # Quote a free-text CSV field the way csv.writer does (QUOTE_MINIMAL); the
+    # other fields are numbers and fixed names that never need it
+    if any(c in text for c in ',"\r\n'):
+        return '"' + text.replace('"', '""') + '"'
+    return text
 
-def log_entry(writer, captured_at: datetime, mode, value, error_msg, logfile,
+def log_entry(ts: str, mode, value, error_msg,
               vbat_mV=None, vin_mV=None, iout_mA=None,
               soc_C=None, rp1_C=None, pmic_C=None):
-    global ROWS_SINCE_FLUSH, FLUSH_EVERY
-    ts = _fmt_ts(captured_at)
-    writer.writerow([
-        ts, mode, f"{value:.4f}",
-        "" if vbat_mV is None else vbat_mV,
-        "" if vin_mV  is None else vin_mV,
-        "" if iout_mA is None else iout_mA,
-        "" if soc_C  is None else f"{soc_C:.1f}",
-        "" if rp1_C  is None else f"{rp1_C:.1f}",
-        "" if pmic_C is None else f"{pmic_C:.1f}",
-        error_msg or ""
-    ])
-    
-    ROWS_SINCE_FLUSH += 1
-    if ROWS_SINCE_FLUSH >= FLUSH_EVERY:
-        logfile.flush()
-        ROWS_SINCE_FLUSH = 0
+    # Format the row into one line and hand it to the writer thread; never blocks
+    # the capture loop
+    # ts: capture time, as formatted by _fmt_ts()
+    global log_dropped
+    row = (
+        f"{ts},{mode},{value:.4f},"
+        f"{'' if vbat_mV is None else vbat_mV},"
+        f"{'' if vin_mV  is None else vin_mV},"
+        f"{'' if iout_mA is None else iout_mA},"
+        f"{'' if soc_C  is None else f'{soc_C:.1f}'},"
+        f"{'' if rp1_C  is None else f'{rp1_C:.1f}'},"
+        f"{'' if pmic_C is None else f'{pmic_C:.1f}'},"
+        f"{csv_field(error_msg or '')}\r\n"
+    )
+    try:
+        log_queue.put_nowait(row)
+    except queue.Full:
+        log_dropped += 1
+
+def log_writer():
+    """
+    Consumer thread: write the rows queued by log_entry() in batches, so a slow
+    SD card stalls this thread instead of the capture loop. Exits once it gets
+    the None sentinel from stop_logger(), after writing everything before it.
+    """
+    rows = []
+    flush_at = None  # time.monotonic() by which the oldest pending row gets written
+    done = False
+    while not done:
+        timeout = None if flush_at is None else max(0.0, flush_at - time.monotonic())
+        try:
+            row = log_queue.get(timeout=timeout)
+            if row is None:
+                done = True
+            else:
+                if not rows:
+                    flush_at = time.monotonic() + FLUSH_MAX_AGE_S
+                rows.append(row)
+        except queue.Empty:
+            pass
+        if rows and (done or len(rows) >= FLUSH_EVERY or time.monotonic() >= flush_at):
+            logfile.write("".join(rows))
+            logfile.flush()
+            os.fsync(logfile.fileno())  # only this thread waits on the SD card
+            rows.clear()
+            flush_at = None
+
+def stop_logger():
+    # SIGINT/SIGTERM only set stop_requested, so the queued rows are written out here
+    writer_busy = False
+    if log_thread is not None:
+        # Give the writer up to 5 s to make room for the sentinel and drain the queue
+        deadline = time.monotonic() + 5.0
+        while log_thread.is_alive() and time.monotonic() < deadline:
+            try:
+                log_queue.put(None, timeout=0.5)
+                break
+            except queue.Full:
+                pass
+        log_thread.join(timeout=max(0.0, deadline - time.monotonic()))
+        writer_busy = log_thread.is_alive()
+    if writer_busy:
+        # Still stuck on the SD card; closing the file under it would fail its write
+        print(f"[log] CSV writer still busy at exit, {log_queue.qsize()} queued rows not written")
+    else:
+        # Anything still queued now was never written (the writer died early)
+        undrained = 0
+        while True:
+            try:
+                undrained += log_queue.get_nowait() is not None
+            except queue.Empty:
+                break
+        if undrained:
+            print(f"[log] {undrained} queued rows not written, the CSV writer had stopped")
+        if logfile is not None:
+            logfile.close()
+    if log_dropped:
+        print(f"[log] {log_dropped} rows dropped, the CSV writer fell behind")
 
 # ============================================================
 # Image processing helpers
 # ============================================================
 
-def decode_digit(segments: dict[str, bool]) -> int | None:
-    global error_msg
-    on_segments = { seg for seg, lit in segments.items() if lit }
-    digit = SEGMENT_DIGIT_MAP.get(frozenset(on_segments))
+def decode_digit(mask: int) -> int | None:
+    digit = SEGMENT_BITMASK_LUT[mask]
     if digit is None:
-        error = f"Warning: decode_digit got unrecognized segment pattern: {sorted(on_segments)}"
-        error_msg = (error_msg + " | " if error_msg else "") + error
+        on_segments = [seg for i, seg in enumerate(SEGMENT_NAMES) if mask >> i & 1]
+        error = f"Warning: decode_digit got unrecognized segment pattern: {on_segments}"
+        error_msgs.append(error)
+        if len(error_msgs) > MAX_ERROR_MSGS:
+            del error_msgs[0]
         print(error)
     return digit
 
-def evaluate_roi(frame_thresh, roi_tuple, on_threshold=50):
-    x1, y1, x2, y2 = roi_tuple
-    roi_image = frame_thresh[y1:y2, x1:x2]
-    white_pixels = cv2.countNonZero(roi_image)
-    total_pixels = roi_image.shape[0] * roi_image.shape[1]
-    black_pixels = float(total_pixels) - white_pixels
-    return black_pixels >= on_threshold
-
 def get_digit_sub_roi(digit_roi):
+    # Integer math throughout: all coords, offsets and sizes are ints, so // gives
+    # the same boxes as math.floor() of the float version
     dx1, dy1, dx2, dy2 = digit_roi
-    x_middle = dx1 + (dx2 - dx1)/2.0
-    y_middle = dy1 + (dy2 - dy1)/2.0
+    x_middle = dx1 + (dx2 - dx1) // 2
+    y_middle = dy1 + (dy2 - dy1) // 2
     short_size = 20
     long_size = 40
     offset_lateral = 36
@@ -349,25 +499,141 @@ def get_digit_sub_roi(digit_roi):
     y_seg_offset_side_top = -42
     y_seg_offset_side_bott = 46
     y_seg_offset_bott = 87
-    roi_top =  (math.floor(x_middle - short_size/2), math.floor(y_middle + y_seg_offset_top - long_size/2),
-                math.floor(x_middle + short_size/2), math.floor(y_middle + y_seg_offset_top + long_size/2))
-    roi_bott = (math.floor(x_middle - short_size/2), math.floor(y_middle + y_seg_offset_bott - long_size/2),
-                math.floor(x_middle + short_size/2), math.floor(y_middle + y_seg_offset_bott + long_size/2))
-    roi_midd = (math.floor(x_middle - short_size/2), math.floor(y_middle  - long_size/2),
-                math.floor(x_middle + short_size/2), math.floor(y_middle + long_size/2))
-    roi_tl =  (math.floor(x_middle - offset_lateral - long_size/2), math.floor(y_middle + y_seg_offset_side_top - short_size/2),
-                math.floor(x_middle - offset_lateral + long_size/2), math.floor(y_middle + y_seg_offset_side_top + short_size/2))
-    roi_tr =  (math.floor(x_middle + offset_lateral - long_size/2), math.floor(y_middle + y_seg_offset_side_top - short_size/2),
-                math.floor(x_middle + offset_lateral + long_size/2), math.floor(y_middle + y_seg_offset_side_top + short_size/2))
-    roi_bl =  (math.floor(x_middle - offset_lateral - long_size/2), math.floor(y_middle + y_seg_offset_side_bott - short_size/2),
-                math.floor(x_middle - offset_lateral + long_size/2), math.floor(y_middle + y_seg_offset_side_bott + short_size/2))
-    roi_br =  (math.floor(x_middle + offset_lateral - long_size/2), math.floor(y_middle + y_seg_offset_side_bott - short_size/2),
-                math.floor(x_middle + offset_lateral + long_size/2), math.floor(y_middle + y_seg_offset_side_bott + short_size/2))
+    hs = short_size // 2
+    hl = long_size // 2
+    roi_top =  (x_middle - hs, y_middle + y_seg_offset_top - hl,
+                x_middle + hs, y_middle + y_seg_offset_top + hl)
+    roi_bott = (x_middle - hs, y_middle + y_seg_offset_bott - hl,
+                x_middle + hs, y_middle + y_seg_offset_bott + hl)
+    roi_midd = (x_middle - hs, y_middle - hl,
+                x_middle + hs, y_middle + hl)
+    roi_tl =  (x_middle - offset_lateral - hl, y_middle + y_seg_offset_side_top - hs,
+                x_middle - offset_lateral + hl, y_middle + y_seg_offset_side_top + hs)
+    roi_tr =  (x_middle + offset_lateral - hl, y_middle + y_seg_offset_side_top - hs,
+                x_middle + offset_lateral + hl, y_middle + y_seg_offset_side_top + hs)
+    roi_bl =  (x_middle - offset_lateral - hl, y_middle + y_seg_offset_side_bott - hs,
+                x_middle - offset_lateral + hl, y_middle + y_seg_offset_side_bott + hs)
+    roi_br =  (x_middle + offset_lateral - hl, y_middle + y_seg_offset_side_bott - hs,
+                x_middle + offset_lateral + hl, y_middle + y_seg_offset_side_bott + hs)
     return (roi_top, roi_tr, roi_br, roi_bott, roi_bl, roi_tl, roi_midd)
 
+# The digit ROIs never move, so their segment ROIs are worked out once, here:
+# ALL_SEGMENT_ROIS[digit_idx][seg_idx], in DIGIT_NAMES/SEGMENT_NAMES order
+ALL_SEGMENT_ROIS = tuple(get_digit_sub_roi(r) for r in array_of_digit_rois)
+SEG_ROI_ARRAY = np.array(ALL_SEGMENT_ROIS, dtype=np.int32)  # the same boxes, shape (5, 7, 4)
+
+def outline_pts(rois, marker=False):
+    # Preview outlines for a list of ROIs, shifted by roi_offs_x/y, as an (N, 4, 2)
+    # int32 array of corners for cv2.polylines/fillPoly; with marker=True, the
+    # small "on" marker in each ROI's bottom-right corner instead
+    r = np.array(rois, dtype=np.int32) + np.array([roi_offs_x, roi_offs_y] * 2, dtype=np.int32)
+    x1, y1, x2, y2 = r.T
+    if marker:
+        x1, y1 = x2 - 5, y2 - 5
+    return np.stack([np.stack([x1, y1], 1), np.stack([x2, y1], 1),
+                     np.stack([x2, y2], 1), np.stack([x1, y2], 1)], axis=1)
+
+# The ROIs and offsets never change, so work out the preview outlines once; each
+# color group is then drawn with a single polylines call
+DOT_OUTLINES = outline_pts(array_of_dot_rois)
+MODE_OUTLINES = outline_pts(array_of_mode_rois)
+DIGIT_OUTLINES = outline_pts(array_of_digit_rois)
+SEGMENT_OUTLINES = outline_pts(SEG_ROI_ARRAY.reshape(-1, 4))
+ROI_OUTLINE_GROUPS = [  # (outlines, BGR color)
+    (DOT_OUTLINES, (255, 0, 0)),
+    (MODE_OUTLINES, (0, 255, 0)),
+    (DIGIT_OUTLINES, (0, 0, 255)),
+    (SEGMENT_OUTLINES, (255, 0, 255)),
+]
+
+# Every ROI as one (N, 4) table: dots, then modes, then the 7 segments of each
+# digit in DIGIT_NAMES/SEGMENT_NAMES order
+ROI_ON_THRESHOLD = 100  # black pixels needed for an ROI to count as "on"
+ALL_ROIS = np.concatenate((array_of_dot_rois, array_of_mode_rois,
+                           SEG_ROI_ARRAY.reshape(-1, 4))).astype(np.intp)
+ROI_AREAS = (ALL_ROIS[:, 2] - ALL_ROIS[:, 0]) * (ALL_ROIS[:, 3] - ALL_ROIS[:, 1])
+
+# Only the LCD's bounding box (the union of all ROIs) gets thresholded and
+# integrated; CROP_ROIS are the same ROIs relative to the crop's top-left corner
+CROP_X1, CROP_Y1 = ALL_ROIS[:, :2].min(axis=0).tolist()
+CROP_X2, CROP_Y2 = ALL_ROIS[:, 2:].max(axis=0).tolist()
+CROP_ROIS = ALL_ROIS - np.array([CROP_X1, CROP_Y1, CROP_X1, CROP_Y1])
+# 0/1 thresholded crop, rewritten in place every frame by read_lcd()
+thresh_buf = np.empty((CROP_Y2 - CROP_Y1, CROP_X2 - CROP_X1), dtype=np.uint8)
+# Summed-area table of the crop, rewritten in place every frame by lcd_integral()
+integral_buf = np.empty((CROP_Y2 - CROP_Y1 + 1, CROP_X2 - CROP_X1 + 1), dtype=np.int32)
+ROI_X1, ROI_Y1, ROI_X2, ROI_Y2 = CROP_ROIS.T
+N_DOTS = len(array_of_dot_rois)
+N_MODES = len(array_of_mode_rois)
+ROI_MARKERS = outline_pts(ALL_ROIS, marker=True)  # in ALL_ROIS order, indexed by roi_on
+# Preview area whose boxes get restored every frame: the crop, plus the pixel
+# past its right/bottom edge that the (inclusive) box and marker corners reach
+OVERLAY_BOX = (slice(CROP_Y1, CROP_Y2 + 1), slice(CROP_X1, CROP_X2 + 1))
+
+def lcd_integral(frame_thresh):
+    # Summed-area table of the 0/1 thresholded crop, as int32: 345 x 710 entries (~1 MB)
+    # instead of 601 x 801 (~1.9 MB) for a full 800x600 frame. Sums over the crop can exceed 65535, so a
+    # 16-bit table is not an option. Written into integral_buf, so no per-frame allocation.
+    return cv2.integral(frame_thresh, integral_buf, sdepth=cv2.CV_32S)
+
+def count_black_pixels(frame_thresh):
+    # frame_thresh: the thresholded crop (see CROP_ROIS)
+    # Black pixels inside every ROI of ALL_ROIS, from one summed-area table of the
+    # 0/1 thresholded frame: four lookups per ROI instead of a slice + countNonZero
+    S = lcd_integral(frame_thresh)
+    white = S[ROI_Y2, ROI_X2] - S[ROI_Y1, ROI_X2] - S[ROI_Y2, ROI_X1] + S[ROI_Y1, ROI_X1]
+    return ROI_AREAS - white
+
+def evaluate_rois(frame_thresh):
+    # frame_thresh: the thresholded crop (see CROP_ROIS)
+    # -> (on/off of every ROI in ALL_ROIS order, 7-bit segment mask per digit,
+    #     decoded digit per mask or -1 if unrecognized)
+    roi_on = count_black_pixels(frame_thresh) >= ROI_ON_THRESHOLD
+    segments_on = roi_on[N_DOTS + N_MODES:].reshape(len(DIGIT_NAMES), len(SEGMENT_NAMES))
+    masks = (segments_on << SEGMENT_SHIFTS).sum(axis=1)
+    return roi_on, masks, SEGMENT_BITMASK_LUT_ARR[masks]
+
+def read_lcd(lcd_gray, keep_mask):
+    # lcd_gray: the LCD crop of the luma plane (see CROP_ROIS)
+    # -> evaluate_rois()'s results + the 0/1 thresholded crop (None if not kept)
+    # Otsu thresholding, which picks the level from the histogram of the LCD area only.
+    # With numba, the level and the ROI counts come straight from the gray crop, so
+    # neither the thresholded crop nor its integral image is written unless
+    # keep_mask (the preview) asks for the crop.
+    if NUMBA_AVAILABLE:
+        level = otsu_level(lcd_gray)  # or a hard-coded level, e.g. 160
+        roi_on, masks, digits = process_frame(lcd_gray, level, CROP_ROIS, ROI_ON_THRESHOLD,
+                                              N_DOTS + N_MODES, len(SEGMENT_NAMES),
+                                              SEGMENT_BITMASK_LUT_ARR)
+        lcd_thresh = None
+        if keep_mask:
+            _, lcd_thresh = cv2.threshold(lcd_gray, level, 1, cv2.THRESH_BINARY, dst=thresh_buf)
+        return roi_on, masks, digits, lcd_thresh
+
+    #Hard-coded thresholding
+    #_, lcd_thresh = cv2.threshold(lcd_gray, 160, 1, cv2.THRESH_BINARY, dst=...)
+
+    #The mask is 0/1 rather than 0/255, so the integral image counts white pixels directly
+    _, lcd_thresh = cv2.threshold(lcd_gray, 0, 1, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=thresh_buf)
+    return (*evaluate_rois(lcd_thresh), lcd_thresh)
+
+def luma_view(yuv):
+    # Y plane of a mapped YUV420 frame ((h * 3/2, stride) array) as an (h, w) view (no copy);
+    # this is the grayscale image
+    w, h = frame_size
+    return yuv[:h, :w]
+
 def setup(resolution=(640, 480), framerate=30, preview=False):
-    global last_capture_time, picam2
-    last_capture_time = time.time() - CAPTURE_INTERVAL
+    global last_capture_time, picam2, frame_size, capture_thread, annot_buf, MappedArray, preview_thread
+    # picamera2 initializes libcamera on import, so only pay for it when a camera is used
+    from picamera2 import MappedArray, Picamera2
+    last_capture_time = time.monotonic() - CAPTURE_INTERVAL
+    # OpenCV threads: once the OCR thread is pinned (see pin_cpus()), one per OCR core.
+    # Otherwise 1 on single/dual-core boards keeps CPU use predictable; with more
+    # cores, let threshold/integral/cvtColor use a few but leave one for the camera.
+    n_cpus = os.cpu_count() or 1
+    cv2.setNumThreads(len(ocr_cpus()) or (1 if n_cpus <= 2 else min(3, n_cpus - 1)))
+    print(f"OpenCV optimized: {cv2.useOptimized()}, threads: {cv2.getNumThreads()}")
     
  #   cams = Picamera2.global_camera_info()
  #   if not cams:
@@ -380,145 +646,223 @@ def setup(resolution=(640, 480), framerate=30, preview=False):
  #           raise RuntimeError("Camera device is busy. Stop any service using it (e.g., 'sudo systemctl stop power-ocr-meter').")
     
     picam2 = Picamera2()
+    # buffer_count: the capture thread may hold 3 requests (2 queued + 1 in loop())
     config = picam2.create_video_configuration(
-        main={"size": resolution, "format": "XRGB8888"}  # single stream
+        main={"size": resolution, "format": "YUV420"},  # single stream; Y plane = grayscale
+        buffer_count=6
     )
     picam2.configure(config)
-    picam2.set_controls({"FrameRate": 10, "AeEnable": True, "AwbEnable": True})  # lighten ISP load
+    frame_size = picam2.stream_configuration("main")["size"]
+    # The LCD crop is sliced straight out of every frame, so the ROIs must fit in it
+    if frame_size[0] < CROP_X2 or frame_size[1] < CROP_Y2:
+        raise RuntimeError(f"Frame {frame_size[0]}x{frame_size[1]} is smaller than the LCD ROIs "
+                           f"need ({CROP_X2}x{CROP_Y2}); use a larger --resolution.")
+    picam2.set_controls({"FrameRate": framerate, "AeEnable": True, "AwbEnable": True})
     picam2.start()
     time.sleep(1.0)
     #throw away first frame
-    _ = picam2.capture_array()
+    picam2.capture_request().release()
+    capture_thread = threading.Thread(target=capture_frames, name="capture", daemon=True)
+    capture_thread.start()
     if preview:
-        cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
-
-def compute_dot_multiplier(dots: dict[str, bool]) -> float:
-    # priority: 0.1, 0.01, 0.001; default 1.0
-    if dots["0.1"]:
-        return 0.1
-    if dots["0.01"]:
-        return 0.01
-    if dots["0.001"]:
-        return 0.001
-    return 1.0
-
-def loop(preview=False):
-    global csv_writer, logfile, error_msg, last_capture_time
-    now = time.time()
-    elapsed = now - last_capture_time
-    if elapsed < CAPTURE_INTERVAL:
-        # Sleep just enough, but cap it so signals remain responsive
-        time.sleep(min(CAPTURE_INTERVAL - elapsed, 0.05))
-        return True
-    if elapsed >= CAPTURE_INTERVAL:
-        # Capture + timestamp (use same timestamp across processing)
-        rgb = picam2.capture_array()
-        captured_at = datetime.now()
-        overlay_ts = _fmt_ts(captured_at)
-
-        frame_clean = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
-        frame_clean_gr_pre = cv2.cvtColor(frame_clean, cv2.COLOR_BGR2GRAY)
-        
-        #Hard-coded thresholding
-        #_, frame_clean_gr = cv2.threshold(frame_clean_gr_pre, 160, 255, cv2.THRESH_BINARY)
-
-        #Otsu thresholding, which pics from the image histogram
-        _, frame_clean_gr = cv2.threshold(frame_clean_gr_pre, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-
-        if preview:
-            frame_annotated_color = cv2.cvtColor(frame_clean_gr, cv2.COLOR_GRAY2BGR)
-            cv2.putText(frame_annotated_color, overlay_ts, (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 200, 0), 1, cv2.LINE_AA)
-
-        # Dots
-        for dot_name, dot_roi in zip(DOT_NAMES, array_of_dot_rois):
-            if preview:
-                x1, y1, x2, y2 = dot_roi
-                cv2.rectangle(frame_annotated_color, (x1 + roi_offs_x, y1 + roi_offs_y),
-                              (x2 + roi_offs_x, y2 + roi_offs_y), (255, 0, 0), 1)
-            roi_status = evaluate_roi(frame_clean_gr, dot_roi, on_threshold=100)
-            lcd_state["dots"][dot_name] = roi_status
-            if preview and roi_status:
-                x1, y1, x2, y2 = dot_roi
-                cv2.rectangle(frame_annotated_color, (x2 + roi_offs_x - 5, y2 + roi_offs_y - 5),
-                              (x2 + roi_offs_x, y2 + roi_offs_y), (0, 0, 255), -1)
-
-        # Modes
-        for mode_name, mode_roi in zip(MODE_INDICATORS, array_of_mode_rois):
-            if preview:
-                x1, y1, x2, y2 = mode_roi
-                cv2.rectangle(frame_annotated_color, (x1 + roi_offs_x, y1 + roi_offs_y),
-                              (x2 + roi_offs_x, y2 + roi_offs_y), (0, 255, 0), 1)
-            roi_status = evaluate_roi(frame_clean_gr, mode_roi, on_threshold=100)
-            lcd_state["modes"][mode_name] = roi_status
-            if preview and roi_status:
-                x1, y1, x2, y2 = mode_roi
-                cv2.rectangle(frame_annotated_color, (x2 + roi_offs_x - 5, y2 + roi_offs_y - 5),
-                              (x2 + roi_offs_x, y2 + roi_offs_y), (0, 0, 255), -1)
-
-        # Digits
-        for digit_name, digit_roi in zip(DIGIT_NAMES, array_of_digit_rois):
-            if preview:
-                x1, y1, x2, y2 = digit_roi
-                cv2.rectangle(frame_annotated_color, (x1 + roi_offs_x, y1 + roi_offs_y),
-                              (x2 + roi_offs_x, y2 + roi_offs_y), (0, 0, 255), 1)
-            segment_rois = get_digit_sub_roi(digit_roi)
-            for seg_name, segment_roi in zip(SEGMENT_NAMES, segment_rois):
-                if preview:
-                    sx1, sy1, sx2, sy2 = segment_roi
-                    cv2.rectangle(frame_annotated_color, (sx1 + roi_offs_x, sy1 + roi_offs_y),
-                                  (sx2 + roi_offs_x, sy2 + roi_offs_y), (255, 0, 255), 1)
-                roi_status = evaluate_roi(frame_clean_gr, segment_roi, on_threshold=100)
-                lcd_state["digits"][digit_name][seg_name] = roi_status
-                if preview and roi_status:
-                    sx1, sy1, sx2, sy2 = segment_roi
-                    cv2.rectangle(frame_annotated_color, (sx2 + roi_offs_x - 5, sy2 + roi_offs_y - 5),
-                                  (sx2 + roi_offs_x, sy2 + roi_offs_y), (0, 0, 255), -1)
-
-        # Decode number
-        digit_values = [decode_digit(lcd_state["digits"][name]) for name in DIGIT_NAMES]
-        if any(v is None for v in digit_values):
-            print("Warning: one or more segments failed to decode:", digit_values)
-            total_value = 0.0
-        else:
-            d4, d3, d2, d1, d0 = digit_values
-            dot_multiplier = compute_dot_multiplier(lcd_state["dots"])
-            total_value = (d4*10000 + d3*1000 + d2*100 + d1*10 + d0) * dot_multiplier
+        annot_buf = np.full((frame_size[1], frame_size[0], 3), 255, dtype=np.uint8)
+        build_roi_overlay()
+        preview_thread = threading.Thread(target=show_preview, name="preview", daemon=True)
+        preview_thread.start()
 
-        active_modes = [mode for mode, on in lcd_state["modes"].items() if on]
-        mode_str = "+".join(active_modes) if active_modes else "unknown"
-
-        # Read LiFePO4wered telemetry (best effort)
-        vbat = vin = iout = None
+def capture_frames():
+    """
+    Producer thread: keep the newest camera requests queued for loop(), so a
+    slow iteration (preview, logging) never stalls the camera. When loop()
+    falls behind, the oldest queued request is dropped and released. Each
+    request is queued with the wall-clock time it arrived, which is when the
+    frame was taken to within a frame period, however long it then waits.
+    """
+    while True:
+        request = picam2.capture_request()
+        received_at = datetime.now()
+        with capture_lock:
+            if capture_stop.is_set():
+                # stop_capture() has drained (or is about to drain) the queue
+                request.release()
+                return
+            if frame_queue.full():
+                try:
+                    frame_queue.get_nowait()[0].release()
+                except queue.Empty:
+                    pass
+            frame_queue.put_nowait((request, received_at))
+
+def next_frame(timeout=2.0):
+    """
+    Return (request, received_at) for the newest queued camera request,
+    releasing any older ones. The caller must release() the returned request.
+    """
+    frame = frame_queue.get(timeout=timeout)
+    while True:
         try:
-            vbat = lp4w_get_vbat_mV()
-            vin  = lp4w_get_vin_mV()
-            iout = lp4w_get_iout_mA()
-        except Exception as e:
-            print(f"[LiFePO4wered] read failed: {e}")
-            
-        # Board temperatures (best-effort)
-        soc_C = rp1_C = pmic_C = None
+            newer = frame_queue.get_nowait()
+        except queue.Empty:
+            return frame
+        frame[0].release()
+        frame = newer
+
+def stop_capture():
+    # Under the lock, so no request gets queued after the drain below; one still
+    # being captured is released by capture_frames() itself
+    with capture_lock:
+        capture_stop.set()
+    if capture_thread is not None:
+        capture_thread.join(timeout=1.0)
+    # hand any frames nobody consumed back to the camera
+    while True:
         try:
-            soc_C, rp1_C, pmic_C = read_named_temps()
-        except Exception as e:
-            print(f"[temps] read failed: {e}")
+            frame_queue.get_nowait()[0].release()
+        except queue.Empty:
+            break
 
+# Decimal point multiplier for every combination of lit dots, indexed by
+# bit i = dots[i]; priority: 0.1, 0.01, 0.001; default 1.0
+DOT_MULTIPLIERS = (1.0, 0.001, 0.01, 0.01, 0.1, 0.1, 0.1, 0.1)
+
+def compute_dot_multiplier(dots: np.ndarray) -> float:
+    # dots in DOT_NAMES order ("0.001", "0.01", "0.1")
+    d0, d1, d2 = dots.tolist()
+    return DOT_MULTIPLIERS[d0 | d1 << 1 | d2 << 2]
+
+def build_roi_overlay():
+    # The ROI boxes never move, so render them once. Outside the LCD crop annot_buf
+    # is never redrawn, so they go straight in there; within OVERLAY_BOX they are
+    # copied back every frame, over the converted crop and last frame's markers.
+    global overlay_crop, overlay_mask
+    overlay = np.zeros_like(annot_buf)
+    for outlines, color in ROI_OUTLINE_GROUPS:
+        cv2.polylines(overlay, outlines, True, color, 1)
+    mask = overlay.any(axis=2, keepdims=True)
+    np.copyto(annot_buf, overlay, where=mask)
+    overlay_crop = overlay[OVERLAY_BOX].copy()
+    overlay_mask = mask[OVERLAY_BOX].copy()
+
+def draw_preview(frame_thresh, overlay_ts, roi_on):
+    # Thresholded frame in color with the timestamp, every ROI box, and a filled
+    # marker in the corner of each ROI that is on (roi_on in ALL_ROIS order).
+    # frame_thresh is the thresholded crop: only that part of annot_buf changes
+    # between frames; the rest keeps the pre-rendered boxes apart from the timestamp band.
+    frame_annotated_color = annot_buf
+    lcd = annot_buf[CROP_Y1:CROP_Y2, CROP_X1:CROP_X2]
+    cv2.cvtColor(frame_thresh, cv2.COLOR_GRAY2BGR, dst=lcd)
+    np.multiply(lcd, 255, out=lcd)  # 0/1 mask -> black/white
+    annot_buf[:TS_BAND_H] = 255
+    cv2.putText(frame_annotated_color, overlay_ts, (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 200, 0), 1, cv2.LINE_AA)
+
+    np.copyto(annot_buf[OVERLAY_BOX], overlay_crop, where=overlay_mask)
+    lit = ROI_MARKERS[roi_on]
+    if len(lit):
+        cv2.fillPoly(frame_annotated_color, lit, (0, 0, 255))
+
+    return frame_annotated_color
+
+def show_preview():
+    """
+    Preview thread: owns the OpenCV window, so every HighGUI call happens here.
+    Draws and shows the newest frame handed over by loop(); loop() drops frames
+    while this is busy, so --preview never slows the OCR down. 'q' in the
+    window stops the program.
+    """
+    cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
+    while True:
+        try:
+            item = preview_queue.get(timeout=0.05)  # keep handling window events between frames
+        except queue.Empty:
+            item = ()
+        if item is None:
+            break
+        if item:
+            cv2.imshow(window_name, draw_preview(*item))
+        if cv2.pollKey() & 0xFF == ord('q'):
+            stop_requested.set()
+    cv2.destroyAllWindows()
+
+def stop_preview():
+    if preview_thread is None:
+        return
+    try:
+        preview_queue.get_nowait()  # make room for the sentinel
+    except queue.Empty:
+        pass
+    preview_queue.put_nowait(None)
+    preview_thread.join(timeout=1.0)
 
-        print(f"{mode_str}, {total_value:.4f}")
-        log_entry(csv_writer, captured_at, mode_str, total_value, error_msg, logfile,
-                  vbat_mV=vbat, vin_mV=vin, iout_mA=iout,
-                  soc_C=soc_C, rp1_C=rp1_C, pmic_C=pmic_C)
-        error_msg = ""
+def loop(preview=False):
+    global logfile, last_capture_time
+    # Wait out the rest of the capture interval in one go, then block until the
+    # camera has a frame for us: no polling in between. A signal ends the wait at once.
+    remaining = CAPTURE_INTERVAL - (time.monotonic() - last_capture_time)
+    if stop_requested.wait(max(0.0, remaining)):
+        return False
+
+    # Capture + timestamp (use same timestamp across processing)
+    # The frame is read in place from the camera's buffer (no memcpy); it is only
+    # valid until the request is released, so everything that reads it happens first.
+    try:
+        request, captured_at = next_frame()
+    except queue.Empty:
+        # Camera hiccup: nothing arrived within next_frame()'s timeout; try again
+        # next interval rather than taking the whole logger down
+        print("[camera] no frame within 2 s, retrying")
+        return True
+    last_capture_time = time.monotonic()
+    overlay_ts = _fmt_ts(captured_at)  # also the CSV timestamp
+    try:
+        with MappedArray(request, "main") as mapped:
+            # Only the LCD's bounding box is needed; the rest of the frame is never read
+            frame_clean_gr_pre = luma_view(mapped.array)[CROP_Y1:CROP_Y2, CROP_X1:CROP_X2]
+            # Threshold + evaluate all ROIs at once, while the buffer is still ours
+            roi_on, masks, digits, lcd_thresh = read_lcd(frame_clean_gr_pre, keep_mask=preview)
+    finally:
+        request.release()
+
+    # Hand the results out in ALL_ROIS order
+    dots_state[:] = roi_on[:N_DOTS]
+    modes_state[:] = roi_on[N_DOTS:N_DOTS + N_MODES]
+    digit_masks[:] = masks
+
+    # Decode number (already looked up in evaluate_rois())
+    if (digits < 0).any():
+        # decode_digit() reports each unrecognized pattern
+        digit_values = [decode_digit(mask) for mask in digit_masks.tolist()]
+        print("Warning: one or more segments failed to decode:", digit_values)
+        total_value = 0.0
+    else:
+        d4, d3, d2, d1, d0 = digits.tolist()
+        dot_multiplier = compute_dot_multiplier(dots_state)
+        total_value = (d4*10000 + d3*1000 + d2*100 + d1*10 + d0) * dot_multiplier
+
+    active_modes = [mode for mode, on in zip(MODE_INDICATORS, modes_state.tolist()) if on]
+    mode_str = "+".join(active_modes) if active_modes else "unknown"
+
+    # Latest LiFePO4wered telemetry + board temperatures from poll_telemetry();
+    # blank when there is none yet or the poller has stalled
+    last = telemetry
+    if last is not None and time.monotonic() - last[0] <= TELEMETRY_MAX_AGE_S:
+        _, vbat, vin, iout, soc_C, rp1_C, pmic_C = last
+    else:
+        vbat = vin = iout = soc_C = rp1_C = pmic_C = None
 
-        if preview:
-            cv2.imshow(window_name, frame_annotated_color)
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q'):
-                return False
+    print(f"{mode_str}, {total_value:.4f}")
+    log_entry(overlay_ts, mode_str, total_value, " | ".join(error_msgs),
+              vbat_mV=vbat, vin_mV=vin, iout_mA=iout,
+              soc_C=soc_C, rp1_C=rp1_C, pmic_C=pmic_C)
+    error_msgs.clear()
 
-        # Honor the capture interval
-        last_capture_time = now
+    # Hand the frame to the preview thread; the crop is copied because thresh_buf
+    # is overwritten by the next capture. Dropped if the last one isn't drawn yet.
+    if preview:
+        try:
+            preview_queue.put_nowait((lcd_thresh.copy(), overlay_ts, roi_on))
+        except queue.Full:
+            pass
 
     return True
 
@@ -527,16 +871,43 @@ def loop(preview=False):
 # ============================================================
 
 def _handle_signal(signum, frame):
-    global RUNNING
-    RUNNING = False
+    stop_requested.set()
 
 signal.signal(signal.SIGINT, _handle_signal)
 signal.signal(signal.SIGTERM, _handle_signal)
 
+def ocr_cpus():
+    # The OCR_CPUS this board has (empty: no pinning)
+    if not hasattr(os, "sched_setaffinity"):
+        return set()
+    return OCR_CPUS & os.sched_getaffinity(0)
+
+def pin_cpus():
+    """
+    Pin the calling thread, the OCR loop, to ocr_cpus(). main() calls this after
+    setup() and the logger/telemetry threads have started, so libcamera and those
+    helpers keep every core and only the OCR work is moved off cores 0 and 1.
+    Priority is left to the service unit (Nice=), raising it needs privileges the
+    service user does not have.
+    """
+    cpus = ocr_cpus()
+    if not cpus:
+        return
+    tid = threading.get_native_id()
+    try:
+        os.sched_setaffinity(tid, cpus)
+    except OSError as e:
+        print(f"[sched] CPU affinity not changed: {e}")
+    print(f"[sched] OCR thread on CPUs {sorted(os.sched_getaffinity(tid))}")
+
 def main():
-    global logfile, csv_writer
+    global logfile, telemetry_thread
     try:
-        setup(resolution=RESOLUTION, framerate=30, preview=args.preview)
+        # The capture thread already overlaps capture with OCR; frames beyond about two
+        # per interval are only captured to be dropped. Low FrameRate lightens ISP load.
+        # --interval 0 means as fast as possible, i.e. the cap.
+        framerate = min(10.0, max(2.0, 2.0 / CAPTURE_INTERVAL)) if CAPTURE_INTERVAL > 0 else 10.0
+        setup(resolution=RESOLUTION, framerate=framerate, preview=args.preview)
 
         # Apply LiFePO4wered policy at start
         persist = getattr(args, "lp4w_persist", LP4W_PERSIST_DEFAULT)
@@ -554,25 +925,28 @@ def main():
         except Exception as e:
             print(f"[LiFePO4wered] VIN_THRESHOLD set failed: {e}")
 
-        logfile, csv_writer = init_logger()
+        logfile = init_logger()
+        # Started after the policy writes above, so they don't share the I2C bus with it
+        telemetry_thread = threading.Thread(target=poll_telemetry, name="telemetry", daemon=True)
+        telemetry_thread.start()
 
-        while RUNNING and loop(preview=args.preview):
+        pin_cpus()
+        while not stop_requested.is_set() and loop(preview=args.preview):
             pass
 
     finally:
+        stop_capture()
         try:
             if picam2 is not None:
                 picam2.stop()
         except Exception:
             pass
-        if args.preview:
-            try:
-                cv2.destroyAllWindows()
-            except Exception:
-                pass
         try:
-            if logfile is not None:
-                logfile.close()
+            stop_preview()
+        except Exception:
+            pass
+        try:
+            stop_logger()
         except Exception:
             pass
 
@@ -45,7 +45,8 @@ WorkingDirectory=${REPO_DIR}
 Environment=PYTHONUNBUFFERED=1
 Environment=LIBCAMERA_LOG_LEVELS=*:ERROR
 Environment=OPENCV_LOG_LEVEL=ERROR
-Nice=10
+# Ahead of background jobs; the script pins its OCR thread to cores 2-3 itself (--cpus)
+Nice=-5
 IOSchedulingClass=idle
 ExecStartPre=/bin/sleep 5
 ExecStart=${PY} ${REPO_DIR}/power_meter_ocr_monitor.py --no-preview --interval ${INTERVAL} --resolution ${RES} --log-dir ${LOG_DIR}